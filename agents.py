@@ -1,57 +1,114 @@
 # Define the agents with role prompting as described in the paper
-from crewai import Agent
-from tools import get_stock_data_tool,get_financials_tool,calculate_metrics_tool,get_news_tool,analyze_sentiment_tool,scrape_tool
+# Agents (and crewai itself) are only constructed when first used
+import threading
 
 
 
 
 # Valuation Agent
-valuation_agent = Agent(
-    role="Valuation Equity Analyst",
-    goal="Analyze valuation trends of assets over extended time horizons, "
-         "identify patterns in valuation metrics, and interpret implications for investors",
-    backstory="Expert in technical analysis and quantitative finance with "
-             "years of experience in identifying market trends and patterns",
-    tools=[],  # Tools will be added through function calls
-    verbose=True,
-    allow_delegation=False,
-    #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
-)
+def create_valuation_agent():
+    from crewai import Agent
+    from llm_cache import get_llm
+    return Agent(
+        role="Valuation Equity Analyst",
+        goal="Analyze valuation trends of assets over extended time horizons, "
+             "identify patterns in valuation metrics, and interpret implications for investors",
+        backstory="Expert in technical analysis and quantitative finance with "
+                 "years of experience in identifying market trends and patterns",
+        tools=[],  # Tools will be added through function calls
+        verbose=True,
+        allow_delegation=False,
+        llm=get_llm(),  # Goes through the LLM record/replay cache
+        #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
+    )
+
 
 # Sentiment Agent
-sentiment_agent = Agent(
-    role="Sentiment Equity Analyst",
-    goal="Analyze financial news, analyst ratings, and disclosures related to securities, "
-         "and assess their implications and sentiment for investors",
-    backstory="Seasoned analyst specializing in market sentiment and behavioral finance, "
-             "with expertise in interpreting news impact on stock prices",
-    tools=[scrape_tool],
-    verbose=True,
-    allow_delegation=False,
-    #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
-)
+def create_sentiment_agent():
+    from crewai import Agent
+    from llm_cache import get_llm
+    from tools import get_tool
+    return Agent(
+        role="Sentiment Equity Analyst",
+        goal="Analyze financial news, analyst ratings, and disclosures related to securities, "
+             "and assess their implications and sentiment for investors",
+        backstory="Seasoned analyst specializing in market sentiment and behavioral finance, "
+                 "with expertise in interpreting news impact on stock prices",
+        tools=[get_tool("scrape_tool")],
+        verbose=True,
+        allow_delegation=False,
+        llm=get_llm(),  # Goes through the LLM record/replay cache
+        #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
+    )
+
 
 # Fundamental Agent
-fundamental_agent = Agent(
-    role="Fundamental Financial Equity Analyst",
-    goal="Analyze company fundamentals based on financial reports and disclosures, "
-         "focusing on cash flow, income, operations, gross margin, and areas of concern",
-    backstory="CFA with extensive experience in fundamental analysis and "
-             "deep understanding of financial statements and business models",
-    tools=[scrape_tool],
-    verbose=True,
-    allow_delegation=False,
-    #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
-)
+def create_fundamental_agent():
+    from crewai import Agent
+    from llm_cache import get_llm
+    from tools import get_tool
+    return Agent(
+        role="Fundamental Financial Equity Analyst",
+        goal="Analyze company fundamentals based on financial reports and disclosures, "
+             "focusing on cash flow, income, operations, gross margin, and areas of concern",
+        backstory="CFA with extensive experience in fundamental analysis and "
+                 "deep understanding of financial statements and business models",
+        tools=[get_tool("scrape_tool")],
+        verbose=True,
+        allow_delegation=False,
+        llm=get_llm(),  # Goes through the LLM record/replay cache
+        #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
+    )
+
 
 # Debate Manager Agent (for consensus building)
-debate_manager = Agent(
-    role="Debate Moderator",
-    goal="Coordinate specialist agents to reach consensus on stock analysis, "
-         "ensure all agents speak at least twice, and consolidate inputs into a final report",
-    backstory="Experienced portfolio manager skilled at facilitating discussions "
-             "among analysts with different perspectives and methodologies",
-    verbose=True,
-    allow_delegation=True,
-    #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
-)
\ No newline at end of file
+def create_debate_manager():
+    from crewai import Agent
+    from llm_cache import get_llm
+    return Agent(
+        role="Debate Moderator",
+        goal="Coordinate specialist agents to reach consensus on stock analysis, "
+             "ensure all agents speak at least twice, and consolidate inputs into a final report",
+        backstory="Experienced portfolio manager skilled at facilitating discussions "
+                 "among analysts with different perspectives and methodologies",
+        verbose=True,
+        allow_delegation=True,
+        llm=get_llm(),  # Goes through the LLM record/replay cache
+        #llm=ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
+    )
+
+
+def create_agent_team():
+    """Build a fresh set of agents, e.g. for one of several runs executing at the same time."""
+    return {
+        "valuation": create_valuation_agent(),
+        "sentiment": create_sentiment_agent(),
+        "fundamental": create_fundamental_agent(),
+        "debate": create_debate_manager(),
+    }
+
+
+# Shared agents used by single-ticker runs, built on first use through get_agent()
+# or attribute access (`from agents import valuation_agent` still works)
+AGENT_FACTORIES = {
+    "valuation_agent": create_valuation_agent,
+    "sentiment_agent": create_sentiment_agent,
+    "fundamental_agent": create_fundamental_agent,
+    "debate_manager": create_debate_manager,
+}
+_agents = {}
+_agents_lock = threading.Lock()
+
+
+def get_agent(name):
+    """Shared instance of the agent registered as `name`, created on first use."""
+    with _agents_lock:
+        if name not in _agents:
+            _agents[name] = AGENT_FACTORIES[name]()
+        return _agents[name]
+
+
+def __getattr__(name):
+    if name in AGENT_FACTORIES:
+        return get_agent(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,153 @@
+# Batch portfolio analysis over a watchlist with bounded concurrency and rate limits
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import rate_limits
+from tracing import span
+from crew import analyze_stock, analyze_stock_profiles
+from agents import create_agent_team
+
+# Requests per second for each provider when none are given
+DEFAULT_LIMITS = {"yfinance": 2.0, "tavily": 1.0, "llm": 3.0}
+
+# Exception names (from provider SDKs we do not import here) worth retrying
+TRANSIENT_NAMES = ("RateLimit", "Timeout", "APIConnection", "ServiceUnavailable", "InternalServer")
+
+
+def is_transient(exc):
+    """True for failures that are likely to succeed on a later attempt."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return any(name in type(exc).__name__ for name in TRANSIENT_NAMES)
+
+
+def load_completed(output_path):
+    """Read the (ticker, risk_tolerance) pairs already written successfully to `output_path`."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A crash can leave a truncated last line
+            if record.get("status") == "ok":
+                completed.add((record["ticker"], record["risk_tolerance"]))
+    return completed
+
+
+def _analyze_with_retries(ticker, risk_profiles, max_retries, backoff):
+    """
+    Analyze `ticker` for `risk_profiles` on a fresh agent team, retrying
+    transient failures with exponential backoff. Several profiles share one
+    set of specialist evidence. Returns ({profile: report text}, retries);
+    the retries are also recorded on a "batch_item" span.
+    """
+    attempt = 0
+    with span("batch_item", ticker, risk_tolerance="+".join(risk_profiles)) as attrs:
+        while True:
+            attrs["retries"] = attempt
+            try:
+                if len(risk_profiles) == 1:
+                    results = {risk_profiles[0]: analyze_stock(ticker, risk_profiles[0], agents=create_agent_team())}
+                else:
+                    results, _ = analyze_stock_profiles(ticker, risk_profiles, agents=create_agent_team())
+                return {risk: getattr(result, "raw", str(result)) for risk, result in results.items()}, attempt
+            except Exception as e:
+                if attempt >= max_retries or not is_transient(e):
+                    raise
+                delay = backoff * (2 ** attempt) * (1 + random.random())
+                print(f"Transient error for {ticker} ({', '.join(risk_profiles)}): {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+
+def run_batch(tickers, risk_profiles=("neutral",), output_path="batch_results.jsonl",
+              max_workers=4, limits=None, max_retries=3, backoff=2.0, share_evidence=True):
+    """
+    Analyze every (ticker, risk profile) pair on a worker pool.
+
+    With `share_evidence` the pending profiles of a ticker run as one
+    analyze_stock_profiles() job, so the specialist work is done once per
+    ticker instead of once per profile.
+
+    Results are appended to `output_path` as one JSON object per line as soon
+    as each run finishes, so the file doubles as the checkpoint: pairs already
+    recorded with status "ok" are skipped when a crashed batch is restarted.
+    `limits` maps provider ("yfinance", "tavily", "llm") to requests per second.
+    Returns a dict of counts by status.
+    """
+    rate_limits.configure(DEFAULT_LIMITS if limits is None else limits)
+    completed = load_completed(output_path)
+    pending = [(t, r) for t in tickers for r in risk_profiles if (t, r) not in completed]
+    print(f"Batch: {len(pending)} runs pending, {len(completed)} already completed")
+    if share_evidence:
+        grouped = {}
+        for ticker, risk in pending:
+            grouped.setdefault(ticker, []).append(risk)
+        jobs = list(grouped.items())
+    else:
+        jobs = [(ticker, [risk]) for ticker, risk in pending]
+
+    counts = {"ok": 0, "error": 0, "skipped": len(completed)}
+    write_lock = threading.Lock()
+    with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_analyze_with_retries, ticker, risks, max_retries, backoff): (ticker, risks)
+            for ticker, risks in jobs
+        }
+        for future in as_completed(futures):
+            ticker, risks = futures[future]
+            try:
+                results, retries = future.result()
+                error = None
+            except Exception as e:
+                results, retries, error = {}, None, f"{type(e).__name__}: {e}"
+            for risk in risks:
+                record = {"ticker": ticker, "risk_tolerance": risk, "finished_at": datetime.now().isoformat()}
+                if error is None:
+                    record.update(result=results[risk], retries=retries, status="ok")
+                else:
+                    record.update(status="error", error=error)
+                counts[record["status"]] += 1
+                with write_lock:
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+    return counts
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run the multi-agent analysis over a watchlist")
+    parser.add_argument("tickers", nargs="*", help="Ticker symbols")
+    parser.add_argument("--watchlist", help="File with one ticker per line")
+    parser.add_argument("--risk", nargs="+", default=["neutral"], choices=["averse", "neutral", "seeking"])
+    parser.add_argument("--output", default="batch_results.jsonl")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--no-share-evidence", action="store_true",
+                        help="Run each risk profile separately instead of sharing the specialist analyses")
+    parser.add_argument("--yfinance-rate", type=float, default=DEFAULT_LIMITS["yfinance"])
+    parser.add_argument("--tavily-rate", type=float, default=DEFAULT_LIMITS["tavily"])
+    parser.add_argument("--llm-rate", type=float, default=DEFAULT_LIMITS["llm"])
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.watchlist:
+        with open(args.watchlist) as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    counts = run_batch(
+        tickers, args.risk, args.output, args.workers,
+        limits={"yfinance": args.yfinance_rate, "tavily": args.tavily_rate, "llm": args.llm_rate},
+        max_retries=args.retries, share_evidence=not args.no_share_evidence
+    )
+    print(f"Batch finished: {counts}")
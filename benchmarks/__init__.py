@@ -0,0 +1 @@
+# Offline benchmarks for the tools and the crew pipeline
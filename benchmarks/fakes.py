@@ -0,0 +1,265 @@
+# Local stand-ins for yfinance, Tavily and the LLM so benchmarks run offline
+import re
+import gzip
+import json
+import time
+import zlib
+import tempfile
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+from crewai import LLM
+import market_data
+import price_store
+import news
+import llm_cache
+import fundamentals
+import scraping
+
+# Calls that would have reached each external provider
+provider_calls = Counter()
+_calls_lock = threading.Lock()
+
+
+def _count(provider):
+    with _calls_lock:
+        provider_calls[provider] += 1
+
+
+def _rng(ticker):
+    return np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+
+
+def synthetic_ohlcv(ticker, start=None, end=None):
+    """Deterministic random-walk daily bars for `ticker` (fetcher signature of PriceStore)."""
+    _count("yfinance")
+    # Generate the full 10-year path so overlapping fetches agree, then slice
+    today = pd.Timestamp.today().normalize()
+    full_index = pd.bdate_range(today - pd.DateOffset(years=10), today)
+    rng = _rng(ticker)
+    close = 100 * np.cumprod(1 + rng.normal(0.0003, 0.018, len(full_index)))
+    spread = np.abs(rng.normal(0, 0.01, len(full_index)))
+    frame = pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.004, len(full_index))),
+        "High": close * (1 + spread),
+        "Low": close * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(100_000, 5_000_000, len(full_index)).astype(float),
+    }, index=full_index)
+    if start is not None:
+        frame = frame[frame.index >= start]
+    if end is not None:
+        frame = frame[frame.index < end]
+    return frame
+
+
+def synthetic_statement(ticker, kind):
+    """Four annual periods of the main line items for one statement type."""
+    _count("yfinance")
+    rng = _rng(ticker + kind)
+    periods = pd.to_datetime([f"{pd.Timestamp.today().year - i}-03-31" for i in range(1, 5)])
+    revenue = rng.uniform(1e9, 5e10) * np.cumprod([1.0] + list(1 - rng.normal(0.08, 0.05, 3)))
+    items = {
+        "financials": {
+            "Total Revenue": revenue,
+            "Cost Of Revenue": revenue * 0.6,
+            "Gross Profit": revenue * 0.4,
+            "Operating Income": revenue * rng.uniform(0.1, 0.2),
+            "EBITDA": revenue * 0.25,
+            "Net Income": revenue * rng.uniform(0.05, 0.12),
+            "Diluted EPS": rng.uniform(1, 50, 4),
+        },
+        "balance_sheet": {
+            "Total Assets": revenue * 1.5,
+            "Total Liabilities Net Minority Interest": revenue * 0.9,
+            "Stockholders Equity": revenue * 0.6,
+            "Current Assets": revenue * 0.5,
+            "Current Liabilities": revenue * 0.35,
+            "Cash And Cash Equivalents": revenue * 0.1,
+            "Total Debt": revenue * 0.4,
+        },
+        "cashflow": {
+            "Operating Cash Flow": revenue * 0.18,
+            "Capital Expenditure": -revenue * 0.07,
+            "Free Cash Flow": revenue * 0.11,
+            "Cash Dividends Paid": -revenue * 0.02,
+        },
+    }[kind]
+    return pd.DataFrame(items, index=periods).T
+
+
+def synthetic_info(ticker):
+    _count("yfinance")
+    return {"longName": f"{ticker} Holdings Ltd", "symbol": ticker}
+
+
+def canned_news(query, max_results):
+    """A fixed handful of articles about whatever company the query names."""
+    _count("tavily")
+    company = query.split(" stock news")[0]
+    templates = [
+        ("{c} beats earnings estimates, analysts upgrade to strong buy", "Revenue growth and profitability improved."),
+        ("{c} faces lawsuit over supply contracts", "The investigation could weigh on margins; shares drop."),
+        ("{c} announces new product innovation", "Management did not cut guidance and expects growth."),
+        ("{c} shares decline as sector turns bearish", "Analysts see a weak quarter and a possible miss."),
+        ("{c} holds annual general meeting", "Shareholders approved the dividend."),
+    ]
+    return [
+        news.format_result({
+            "title": title.format(c=company),
+            "content": body,
+            "url": f"https://news.example.com/{zlib.crc32((company + title).encode())}",
+        })
+        for title, body in templates[:max_results]
+    ]
+
+
+def investor_page(ticker):
+    """HTML of a company's investor-relations page, with the chrome the scraper should strip."""
+    paragraphs = "".join(
+        f"<p>{ticker} Holdings reported {kind} for the quarter; management reiterated its outlook.</p>"
+        for kind in ("revenue growth", "stable margins", "higher free cash flow", "a new buyback")
+    )
+    return (
+        f"<html><head><title>{ticker} Investor Relations</title><script>trackPageView()</script></head>"
+        f"<body><nav>Home Investors Careers</nav><main><h1>{ticker} quarterly results</h1>{paragraphs}</main>"
+        "<footer>Cookie settings</footer></body></html>"
+    )
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    """
+    Web server for the scrape tool: /ir/<ticker> serves a gzipped page with
+    an ETag (304 when it matches If-None-Match), /old/<ticker> redirects there.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        _count("web")
+        ticker = self.path.rstrip("/").rsplit("/", 1)[-1]
+        if self.path.startswith("/old/"):
+            self._reply(301, {"Location": f"/ir/{ticker}"})
+            return
+        etag = f'"{zlib.crc32(ticker.encode("utf-8"))}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._reply(304, {"ETag": etag})
+            return
+        body = gzip.compress(investor_page(ticker).encode("utf-8"))
+        self._reply(200, {"Content-Type": "text/html; charset=utf-8", "Content-Encoding": "gzip", "ETag": etag}, body)
+
+    def _reply(self, status, headers, body=b""):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_page_server():
+    """Serve _PageHandler on a free local port from a daemon thread; returns the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# Base URL of the local page server, set by install()
+page_base_url = None
+
+# Arguments the scripted LLM passes to each tool it decides to call
+TOOL_ARGS = {
+    "Calculate Financial Metrics": lambda ticker: {"ticker": ticker, "period": "3mo"},
+    "Get Stock Historical Data": lambda ticker: {"ticker": ticker, "period": "3mo"},
+    "Get Company Financials": lambda ticker: {"ticker": ticker},
+    "News Search Tool": lambda ticker: {"ticker": ticker},
+    # One URL that redirects and one served directly; repeat calls revalidate with a 304
+    "Read website content": lambda ticker: {
+        "website_url": f"{page_base_url}/old/{ticker}", "urls": [f"{page_base_url}/ir/{ticker}"]
+    },
+}
+
+
+class ScriptedLLM(LLM):
+    """
+    LLM stand-in with a fixed script and configurable latency.
+
+    On the first turn of a task it calls the first known tool listed in the
+    prompt; once it has seen an observation it returns a final answer with a
+    BUY/SELL recommendation.
+    """
+
+    def __init__(self, latency=0.0, **kwargs):
+        super().__init__(model="scripted", **kwargs)
+        self.latency = latency
+
+    def call(self, messages, tools=None, *args, **kwargs):
+        _count("llm")
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        match = re.search(r"\b(BENCH[A-Z0-9]+)\b", prompt)
+        ticker = match.group(1) if match else "UNKNOWN"
+
+        observed = any("Observation:" in str(m.get("content", "")) for m in messages[2:])
+        if not observed:
+            for tool_name, make_args in TOOL_ARGS.items():
+                if tool_name in prompt:
+                    return (
+                        "Thought: I should gather data first.\n"
+                        f"Action: {tool_name}\n"
+                        f"Action Input: {json.dumps(make_args(ticker))}"
+                    )
+        recommendation = "BUY" if zlib.crc32(ticker.encode()) % 2 else "SELL"
+        return (
+            "Thought: I now know the final answer\n"
+            f"Final Answer: Recommendation: {recommendation} (confidence: 7/10). "
+            f"Scripted benchmark analysis for {ticker}."
+        )
+
+    def supports_function_calling(self):
+        return False
+
+
+def install(llm_latency=0.0):
+    """
+    Point every provider seam at the local fakes and return the scripted LLM.
+
+    Stores are redirected to a fresh temporary directory so runs start cold.
+    Web pages come from a local server; the scraper revalidates every page
+    (max_age=0), so repeat fetches exercise the conditional GET.
+    """
+    global page_base_url
+    workdir = tempfile.mkdtemp(prefix="equity_bench_")
+    store = price_store.PriceStore(store_dir=workdir, fetcher=synthetic_ohlcv)
+    market_data.ENDPOINTS.update({
+        "history": lambda ticker, period="3mo", live=False: store.history(ticker, period, live),
+        "financials": lambda ticker: synthetic_statement(ticker, "financials"),
+        "balance_sheet": lambda ticker: synthetic_statement(ticker, "balance_sheet"),
+        "cashflow": lambda ticker: synthetic_statement(ticker, "cashflow"),
+        "info": synthetic_info,
+    })
+
+    news.news_store.path = f"{workdir}/news.db"
+    news.news_store.mode = "record"
+    news.news_store.search_fn = canned_news
+    news.news_store._schema_ready = False
+
+    fundamentals.fundamentals_engine.path = f"{workdir}/fundamentals.db"
+    fundamentals.fundamentals_engine._schema_ready = False
+
+    if page_base_url is None:
+        page_base_url = start_page_server()
+    scraping.scraper = scraping.Scraper(cache_dir=f"{workdir}/pages", max_age=0)
+
+    llm_cache._llm = ScriptedLLM(latency=llm_latency)
+    provider_calls.clear()
+    return llm_cache._llm
@@ -0,0 +1,275 @@
+# Offline benchmark suite: per-tool latency and the full analyze_stock pipeline
+#
+#   python -m benchmarks.run_benchmarks --sizes 1 10 500 --output bench_report.json
+#   python -m benchmarks.run_benchmarks --compare old_report.json
+import io
+import sys
+import json
+import time
+import inspect
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+import numpy as np
+from benchmarks import fakes
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds."""
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": int(len(ms)),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+# Extra calls after the timed ones that run under tracemalloc to measure peak memory
+MEMORY_REPEATS = 3
+
+
+def measure(fn, repeats):
+    """
+    Run `fn(0)`..`fn(repeats - 1)` timed; return latency percentiles, peak
+    traced memory and provider calls.
+
+    tracemalloc hooks every allocation and would inflate the latencies, so
+    peak memory comes from MEMORY_REPEATS further calls (`fn(repeats)`
+    onwards) traced separately; `fn` must accept those indices too.
+    """
+    fakes.provider_calls.clear()
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    provider_calls = dict(fakes.provider_calls)
+
+    tracemalloc.start()
+    for i in range(repeats, repeats + MEMORY_REPEATS):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        **percentiles(samples),
+        "peak_memory_mb": peak / 2**20,
+        "provider_calls": provider_calls,
+    }
+
+
+def bench_tickers(stage, count):
+    """`count` tickers used by one benchmark stage only, so no stage starts on stores another one warmed."""
+    return [f"BENCH{stage}X{i:04d}" for i in range(count)]
+
+
+def tool_arguments(name, ticker):
+    """Arguments for one `_run` call of the tool class `name`, or None if unknown."""
+    if name == "SentimentAnalysisTool":
+        return {"news_items": fakes.canned_news(f"{ticker} Holdings Ltd {ticker} stock news", 5)}
+    instance_name = {
+        "GetStockHistoricalDataTool": "Get Stock Historical Data",
+        "CalculateFinancialMetricsTool": "Calculate Financial Metrics",
+        "GetCompanyFinancialsTool": "Get Company Financials",
+        "NewsSearchTool": "News Search Tool",
+        "ScrapeWebsiteTool": "Read website content",
+    }.get(name)
+    return fakes.TOOL_ARGS[instance_name](ticker) if instance_name else None
+
+
+def bench_tools(repeats):
+    """Time `_run` of every BaseTool subclass defined in tools.py, cold and warm."""
+    import tools
+    from crewai.tools import BaseTool
+
+    results = {}
+    for index, (name, cls) in enumerate(inspect.getmembers(tools, inspect.isclass)):
+        if not issubclass(cls, BaseTool) or cls.__module__ != tools.__name__:
+            continue
+        if tool_arguments(name, "BENCH0") is None:
+            results[name] = {"skipped": "no benchmark arguments defined"}
+            continue
+        tickers = bench_tickers(f"T{index}", repeats + MEMORY_REPEATS)
+        tool = cls()
+        # Cold: a new ticker every call; warm: the same ticker again
+        results[name] = {
+            "cold": measure(lambda i: tool._run(**tool_arguments(name, tickers[i % len(tickers)])), repeats),
+            "warm": measure(lambda i: tool._run(**tool_arguments(name, tickers[0])), repeats),
+        }
+    return results
+
+
+def bench_streaming(repeats, bars=252):
+    """Cost of one new bar: incremental StreamingMetrics update vs a full compute_metrics recompute."""
+    from metrics_engine import compute_metrics
+    from streaming_metrics import StreamingMetrics
+
+    closes = fakes.synthetic_ohlcv("STREAM")["Close"].to_numpy()
+    history, new_bars = closes[:bars], closes[bars:bars + repeats + MEMORY_REPEATS]
+    state = StreamingMetrics()
+    for i, close in enumerate(history):
+        state.update(close, i)
+
+    def incremental(i):
+        state.update(new_bars[i], bars + i)
+        state.metrics()
+
+    return {
+        "incremental": measure(incremental, repeats),
+        "batch": measure(lambda i: compute_metrics(closes[:bars + i + 1]), repeats),
+    }
+
+
+def check_streaming(bars=400, window=21, risk_free_rate=0.03, tolerance=1e-9):
+    """
+    StreamingMetrics fed bar by bar (with gaps, a benchmark and a save/load
+    restart halfway) must match compute_metrics over the same closes.
+    """
+    import math
+    import os
+    import tempfile
+    from metrics_engine import compute_metrics
+    from streaming_metrics import StreamingMetricsBook
+
+    rng = np.random.default_rng(0)
+    closes = 100 * np.cumprod(1 + rng.normal(0.0005, 0.02, (bars, 3)), axis=0)
+    closes[:30, 1] = np.nan
+    closes[[50, 51, 120, bars - 100], 0] = np.nan
+    closes[bars // 2, 2] = np.nan
+    benchmark = 100 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+    benchmark[77] = np.nan
+    batch = compute_metrics(closes, benchmark, risk_free_rate=risk_free_rate, window=window)
+
+    def feed(start, stop):
+        return [(f"T{j}", d, closes[d, j], benchmark[d]) for d in range(start, stop) for j in range(closes.shape[1])]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "streaming_metrics.json")
+        book = StreamingMetricsBook(path, window=window, risk_free_rate=risk_free_rate)
+        book.consume(feed(0, bars // 2))
+        book.save()
+        # Replay an overlapping window after the restart; only the new bars should count
+        book = StreamingMetricsBook.load(path)
+        book.consume(feed(bars // 3, bars))
+
+    max_diff, mismatches = 0.0, []
+    for j in range(closes.shape[1]):
+        streamed = book.metrics(f"T{j}")
+        for key, values in batch.items():
+            expected = values[-1, j] if key == "rolling_volatility" else values[j]
+            actual = streamed[key]
+            if math.isnan(expected) or math.isnan(actual):
+                if not (math.isnan(expected) and math.isnan(actual)):
+                    mismatches.append(f"T{j}.{key}")
+                continue
+            diff = abs(expected - actual) / max(1.0, abs(expected))
+            max_diff = max(max_diff, diff)
+            if diff > tolerance:
+                mismatches.append(f"T{j}.{key}")
+    return {"max_rel_diff": float(max_diff), "tolerance": tolerance, "mismatches": mismatches}
+
+
+def bench_pipeline(sizes, risk_tolerance, concurrent):
+    """Time analyze_stock end to end for each universe size."""
+    import consensus
+    from crew import analyze_stock
+    from agents import create_agent_team
+
+    results = {}
+    for size in sizes:
+        tickers = bench_tickers(f"P{size}", size + MEMORY_REPEATS)
+        paths_before = consensus.path_stats()
+        start = time.perf_counter()
+        # crewai is verbose; keep the report readable
+        with redirect_stdout(io.StringIO()):
+            stats = measure(
+                lambda i: analyze_stock(tickers[i], risk_tolerance, concurrent=concurrent, agents=create_agent_team()),
+                size
+            )
+        stats["total_s"] = time.perf_counter() - start
+        # path_stats() counts the whole process; keep only this size's debates
+        paths = consensus.path_stats()
+        counts = {
+            path: count - paths_before.get(path, 0)
+            for path, count in paths.items() if path not in ("total", "fast_path_rate")
+        }
+        total = sum(counts.values())
+        stats["debate_paths"] = {
+            **counts, "total": total, "fast_path_rate": counts.get("fast_path", 0) / total if total else 0.0
+        }
+        results[str(size)] = stats
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline, threshold):
+    """Print p50 changes against `baseline`; return the list of regressions above `threshold`."""
+    regressions = []
+
+    def walk(new, old, path):
+        if isinstance(new, dict) and isinstance(old, dict):
+            if "p50_ms" in new and "p50_ms" in old:
+                change = new["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+                print(f"{path:60s} p50 {old['p50_ms']:10.2f} -> {new['p50_ms']:10.2f} ms ({change:+.1%})")
+                if change > threshold:
+                    regressions.append(path)
+            for key in new:
+                if key in old:
+                    walk(new[key], old[key], f"{path}/{key}" if path else key)
+
+    walk(report, baseline, "")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks with stub providers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 500], help="Universe sizes for the pipeline")
+    parser.add_argument("--tool-repeats", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per scripted LLM call")
+    parser.add_argument("--risk", default="neutral")
+    parser.add_argument("--concurrent", action="store_true", help="Run the specialists concurrently")
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--output", default="bench_report.json")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50 slowdown before failing")
+    args = parser.parse_args()
+
+    fakes.install(llm_latency=args.llm_latency)
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "tools": bench_tools(args.tool_repeats),
+        "streaming": bench_streaming(args.tool_repeats),
+        "streaming_check": check_streaming(),
+    }
+    if not args.skip_pipeline:
+        report["pipeline"] = bench_pipeline(args.sizes, args.risk, args.concurrent)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark report written to {args.output}")
+    if report["streaming_check"]["mismatches"]:
+        print(f"Streaming metrics differ from compute_metrics: {', '.join(report['streaming_check']['mismatches'])}")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Startup benchmark: import time and memory of the entry modules, each measured in a fresh interpreter
+#
+#   python -m benchmarks.startup --repeats 5 --output startup_report.json
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries whose import dominates startup; reported when a target pulls them in
+HEAVY_MODULES = ("crewai", "crewai_tools", "langchain_community", "yfinance", "pandas", "numpy", "matplotlib", "tiktoken")
+
+# label -> statement timed in the child interpreter
+TARGETS = {
+    "import crew": "import crew",
+    "import batch": "import batch",
+    "import jobs": "import jobs",
+    "import tools": "import tools",
+    "build agent team": "import agents; agents.create_agent_team()",
+}
+
+CHILD = """
+import sys, time, json, resource, tracemalloc
+tracemalloc.start()
+start = time.perf_counter()
+exec(compile({statement!r}, "<startup>", "exec"))
+elapsed = time.perf_counter() - start
+_, peak = tracemalloc.get_traced_memory()
+print(json.dumps({{
+    "seconds": elapsed,
+    "traced_peak_mb": peak / 2**20,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(statement, repeats):
+    """Run `statement` in `repeats` fresh interpreters and summarize the samples."""
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD.format(statement=statement, heavy=HEAVY_MODULES)],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        if output.returncode != 0:
+            return {"error": output.stderr.strip().splitlines()[-1] if output.stderr else "failed"}
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    seconds = np.array([s["seconds"] for s in samples]) * 1000
+    return {
+        "p50_ms": float(np.percentile(seconds, 50)),
+        "max_ms": float(seconds.max()),
+        "traced_peak_mb": max(s["traced_peak_mb"] for s in samples),
+        "max_rss_mb": max(s["max_rss_mb"] for s in samples),
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and memory benchmark for the entry modules")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="startup_report.json")
+    args = parser.parse_args()
+
+    report = {label: measure(statement, args.repeats) for label, statement in TARGETS.items()}
+    for label, stats in report.items():
+        if "error" in stats:
+            print(f"{label:<20} error: {stats['error']}")
+        else:
+            print(f"{label:<20} {stats['p50_ms']:9.1f} ms  rss {stats['max_rss_mb']:7.1f} MB  heavy: {', '.join(stats['heavy_modules']) or '-'}")
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
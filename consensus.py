@@ -0,0 +1,171 @@
+# Debate stage helpers: recommendation extraction, the unanimous fast path and debate budgets
+import re
+import time
+import threading
+from collections import Counter
+
+# "Recommendation: BUY", "final investment recommendation is to **SELL**", ...
+_LABELLED = re.compile(
+    r"recommendation\W{0,12}(?:is\W{0,4})?(?:to\W{0,4})?(?:a\W{0,4})?(?:strong\s+)?(BUY|SELL|HOLD)\b",
+    re.IGNORECASE
+)
+# A bare upper-case call anywhere in the text, used when nothing is labelled
+_BARE = re.compile(r"\b(BUY|SELL|HOLD)\b")
+# "Recommendation (averse): SELL", asked for when one report covers every risk profile
+_PROFILE_LABELLED = r"recommendation\s*\(\s*{profile}\s*\)\W{{0,12}}(?:strong\s+)?(BUY|SELL|HOLD)\b"
+# "confidence: 75%", "confidence 0.7", "Confidence: 8/10", "confidence of 4 out of 5"
+_CONFIDENCE_NUMBER = re.compile(
+    r"confidence\W{0,15}(?:(?:level|score|of|is)\W{1,5})?(\d{1,3}(?:\.\d+)?)\s*(%|(?:/|out\s+of)\s*(\d{1,3}))?",
+    re.IGNORECASE
+)
+_CONFIDENCE_WORD = re.compile(
+    r"(?:confidence\W{0,15}(high|moderate|medium|low)\b|\b(high|moderate|medium|low)\s+confidence)", re.IGNORECASE
+)
+CONFIDENCE_LEVELS = {"high": 0.8, "moderate": 0.6, "medium": 0.6, "low": 0.4}
+
+
+def _confidence(match):
+    if match.re is _CONFIDENCE_WORD:
+        return CONFIDENCE_LEVELS[(match.group(1) or match.group(2)).lower()]
+    value = float(match.group(1))
+    if match.group(3) and float(match.group(3)):
+        return value / float(match.group(3))
+    if match.group(2) or value > 10:
+        return value / 100
+    # Without a scale, "0.7" and "1.0" are fractions and "7" (or "1") is out of 10
+    if value < 1 or (value == 1 and "." in match.group(1)):
+        return value
+    return value / 10
+
+
+def extract_call(text, profile=None):
+    """
+    Recommendation and confidence stated in a specialist report.
+
+    Returns {"recommendation": "BUY"/"SELL"/"HOLD" or None, "confidence":
+    0-1 float or None}. The last labelled recommendation wins, since reports
+    usually end with their conclusion. With `profile`, only a
+    "Recommendation (<profile>): ..." line counts, for reports written for
+    every risk profile at once. The confidence is the one stated closest to
+    the winning recommendation, preferably on the same line.
+    """
+    text = str(text or "")
+    if profile is not None:
+        matches = list(re.finditer(_PROFILE_LABELLED.format(profile=re.escape(profile)), text, re.IGNORECASE))
+    else:
+        matches = list(_LABELLED.finditer(text)) or list(_BARE.finditer(text))
+    call = matches[-1] if matches else None
+    if profile is not None and call is None:
+        return {"recommendation": None, "confidence": None}
+
+    stated = list(_CONFIDENCE_NUMBER.finditer(text)) + list(_CONFIDENCE_WORD.finditer(text))
+    confidence = None
+    if stated:
+        def distance(match):
+            if call is None:
+                return (False, match.start())
+            between = text[min(call.end(), match.end()):max(call.start(), match.start())]
+            return ("\n" in between, len(between))
+        confidence = _confidence(min(stated, key=distance))
+    return {
+        "recommendation": call.group(1).upper() if call else None,
+        "confidence": None if confidence is None else min(max(confidence, 0.0), 1.0),
+    }
+
+
+def unanimous(calls, min_confidence=0.0):
+    """
+    The shared recommendation when every specialist made the same call with
+    at least `min_confidence` (a missing confidence only passes when
+    `min_confidence` is 0), otherwise None.
+    """
+    recommendations = {call["recommendation"] for call in calls.values()}
+    if len(recommendations) != 1 or None in recommendations:
+        return None
+    for call in calls.values():
+        confidence = call["confidence"]
+        if min_confidence > 0 and (confidence is None or confidence < min_confidence):
+            return None
+    return recommendations.pop()
+
+
+def consolidation_messages(ticker, risk_tolerance, reports, calls, reason):
+    """Prompt for writing the final report in one LLM call from the specialist reports."""
+    sections = "\n\n".join(
+        f"## {name.title()} analyst (recommendation: {calls[name]['recommendation'] or 'unclear'})\n{report}"
+        for name, report in reports.items()
+    )
+    return [
+        {"role": "system", "content": "You are an experienced portfolio manager consolidating analyst reports."},
+        {"role": "user", "content": f"""
+        {reason}
+        Consolidate the specialist analyses of {ticker} stock below into a final comprehensive stock
+        analysis report for an investor with {risk_tolerance} risk tolerance.
+
+        The report should include:
+        1. Executive summary with consensus recommendation
+        2. Detailed analysis from each perspective
+        3. Key positive indicators and concerns
+        4. Final investment recommendation (BUY/SELL)
+        5. Risk assessment aligned with the {risk_tolerance} profile
+
+        {sections}
+        """},
+    ]
+
+
+class DebateBudgetExceeded(BaseException):
+    """
+    Raised from the crew step callback when the debate runs over budget.
+
+    Derives from BaseException so crewai's per-task retry handling, which
+    catches Exception, does not restart the debate it is meant to stop.
+    """
+
+
+class DebateBudget:
+    """
+    Limits for the debate stage.
+
+    `max_rounds` is how often each analyst is asked to speak; the debate is
+    cut off once the moderator has put more than `max_rounds` questions per
+    analyst. `max_turns` (questions put to the analysts in total),
+    `max_seconds` and `max_tokens` (tokens generated in the debate) cut it
+    off when reached. None means unlimited. `min_confidence` is the
+    confidence every specialist needs for the unanimous fast path.
+    """
+
+    def __init__(self, max_rounds=2, max_turns=None, max_seconds=None, max_tokens=None, min_confidence=0.0):
+        self.max_rounds = max_rounds
+        self.min_confidence = min_confidence
+        self.max_turns = max_turns
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+
+    def check(self, turns, started_at, tokens, analysts=None):
+        if self.max_rounds is not None and analysts and turns > self.max_rounds * analysts:
+            raise DebateBudgetExceeded(f"round limit of {self.max_rounds} per analyst passed")
+        if self.max_turns is not None and turns >= self.max_turns:
+            raise DebateBudgetExceeded(f"turn budget of {self.max_turns} reached")
+        if self.max_seconds is not None and time.time() - started_at >= self.max_seconds:
+            raise DebateBudgetExceeded(f"time budget of {self.max_seconds}s reached")
+        if self.max_tokens is not None and tokens >= self.max_tokens:
+            raise DebateBudgetExceeded(f"token budget of {self.max_tokens} reached")
+
+
+# Process-wide count of how each debate ended: "fast_path", "full_debate" or "budget_cutoff"
+_paths = Counter()
+_paths_lock = threading.Lock()
+
+
+def record_path(path):
+    with _paths_lock:
+        _paths[path] += 1
+
+
+def path_stats():
+    """Debate outcomes so far and the share that took the fast path."""
+    with _paths_lock:
+        counts = dict(_paths)
+    total = sum(counts.values())
+    return {**counts, "total": total, "fast_path_rate": counts.get("fast_path", 0) / total if total else 0.0}
@@ -1,34 +1,344 @@
 # Create a function to run the multi-agent analysis for a given ticker
+import os
+import time
+import functools
+import threading
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from tasks import create_valuation_task,create_sentiment_task,create_fundamental_task,create_debate_task
-from crewai import Agent,Task,Crew,Process
-from tools import get_stock_data_tool,get_financials_tool,calculate_metrics_tool,get_news_tool,analyze_sentiment_tool,scrape_tool
-from agents import valuation_agent,sentiment_agent,fundamental_agent,debate_manager
+from tasks import RISK_PROFILES, SHARED_EVIDENCE
+from agents import get_agent
+from market_data import run_cache
+from scraping import run_pages
+import consensus
+from tracing import current_tracer, span, trace_run
 
 
 
 
 
 
-def analyze_stock(ticker, risk_tolerance="neutral"):
+# Tools crewai gives an agent with allow_delegation=True when its crew has coworkers
+DELEGATION_TOOLS = ("delegate work to coworker", "ask question to coworker")
+
+
+class _CrewCallbacks:
     """
-    Run multi-agent analysis for a given stock ticker
+    Step and task callbacks for one crew.
+
+    Both callbacks record "agent_turn" and "task" spans on the current
+    tracer, attributed to the agent of the task that is running; task spans
+    carry the number of times crewai retried the task.
+    `on_output(role, output)` is called as soon as each task finishes.
+    LLM calls, tool calls and tasks are counted into `usage` when a Counter
+    is passed; several crews running in parallel may share one. A
+    consensus.DebateBudget passed as `budget` is checked on every step: each
+    delegation to a coworker is one debate turn, and the tokens of every
+    step, the coworkers' included, count towards the token budget.
     """
-    print(f"Starting analysis for {ticker} with {risk_tolerance} risk tolerance...")
 
-    # Create tasks
-    valuation_task = create_valuation_task(ticker, risk_tolerance)
-    sentiment_task = create_sentiment_task(ticker, risk_tolerance)
-    fundamental_task = create_fundamental_task(ticker, risk_tolerance)
-    debate_task = create_debate_task(ticker, risk_tolerance)
+    _usage_lock = threading.Lock()
+
+    def __init__(self, tasks, on_output=None, usage=None, budget=None, coworkers=0):
+        self.tasks = list(tasks)
+        self.on_output = on_output
+        self.usage = usage
+        self.budget = budget
+        self.coworkers = coworkers
+        self.index = 0
+        self.task_start = self.last_step = self.started_at = time.time()
+        self.turns = 0
+        self.generated_tokens = 0
+        self.executions_at_start = self._agent_executions()
+
+    def _task(self):
+        return self.tasks[min(self.index, len(self.tasks) - 1)]
+
+    def _agent_role(self):
+        return self._task().agent.role
 
-    # Create crew
-    crew = Crew(
-        agents=[valuation_agent, sentiment_agent, fundamental_agent, debate_manager],
-        tasks=[valuation_task, sentiment_task, fundamental_task, debate_task],
+    def _agent_executions(self):
+        # crewai bumps this counter each time it re-executes a task after an error
+        return getattr(self._task().agent, "_times_executed", 0) or 0
+
+    def _task_retries(self):
+        guardrail_retries = getattr(self._task(), "retry_count", 0) or 0
+        return max(self._agent_executions() - self.executions_at_start, 0) + guardrail_retries
+
+    def on_step(self, step, agent=None):
+        """Step callback; `agent` is the agent taking the step when it is not the task's own (a coworker)."""
+        now = time.time()
+        role = agent.role if agent is not None else self._agent_role()
+        tool = getattr(step, "tool", None)
+        tracer = current_tracer()
+        if tracer is not None:
+            tracer.record("agent_turn", role, self.last_step, now, step=type(step).__name__, tool=tool)
+        self.last_step = now
+        self._count(llm_calls=1, tool_calls=int(tool is not None))
+        if self.budget is not None:
+            from payloads import count_tokens
+            self.turns += int(str(tool or "").strip().lower() in DELEGATION_TOOLS)
+            self.generated_tokens += count_tokens(str(getattr(step, "text", None) or step))
+            # The step that delivers the task's final answer is never cut off
+            if role != self._agent_role() or type(step).__name__ != "AgentFinish":
+                self.budget.check(self.turns, self.started_at, self.generated_tokens, self.coworkers)
+
+    def _count(self, **counts):
+        if self.usage is not None:
+            with self._usage_lock:
+                self.usage.update(counts)
+
+    def on_task(self, output):
+        now = time.time()
+        tracer = current_tracer()
+        if tracer is not None:
+            tracer.record(
+                "task", self._agent_role(), self.task_start, now,
+                payload_bytes=len(str(getattr(output, "raw", output)).encode("utf-8")),
+                retries=self._task_retries()
+            )
+        self._count(tasks=1)
+        if self.on_output is not None:
+            self.on_output(self._agent_role(), output)
+        self.index += 1
+        self.task_start = self.last_step = now
+        self.executions_at_start = self._agent_executions()
+
+
+def _crew(agents, tasks, on_output=None, usage=None, budget=None):
+    """Sequential crew over `tasks` with throttling and tracing callbacks."""
+    from crewai import Crew, Process
+    task_agents = {id(task.agent) for task in tasks}
+    coworkers = sum(1 for agent in agents if id(agent) not in task_agents)
+    callbacks = _CrewCallbacks(tasks, on_output, usage, budget, coworkers)
+    # crewai only gives agents without a step callback the crew's one, so an agent
+    # reused from an earlier crew would keep reporting to that crew
+    for agent in agents:
+        agent.step_callback = (
+            callbacks.on_step if id(agent) in task_agents else functools.partial(callbacks.on_step, agent=agent)
+        )
+    return Crew(
+        agents=agents,
+        tasks=tasks,
         verbose=True,
-        process=Process.sequential  # Run tasks sequentially
+        process=Process.sequential,  # Run tasks sequentially
+        step_callback=callbacks.on_step,
+        task_callback=callbacks.on_task
     )
 
-    # Execute the crew
-    result = crew.kickoff()
-    return result
\ No newline at end of file
+
+def _run_task(agent, task, on_output=None, usage=None):
+    """Run one task in its own single-agent crew and return its wall time in seconds."""
+    start = time.perf_counter()
+    _crew([agent], [task], on_output, usage).kickoff()
+    return time.perf_counter() - start
+
+
+def _specialist_tasks(ticker, risk_tolerance, agents):
+    """name -> (agent, task) for the valuation, sentiment and fundamental specialists."""
+    return {
+        "valuation": (agents["valuation"], create_valuation_task(ticker, risk_tolerance, agent=agents["valuation"])),
+        "sentiment": (agents["sentiment"], create_sentiment_task(ticker, risk_tolerance, agent=agents["sentiment"])),
+        "fundamental": (agents["fundamental"], create_fundamental_task(ticker, risk_tolerance, agent=agents["fundamental"])),
+    }
+
+
+def _run_specialists_concurrent(specialists, max_workers, timings, on_output=None, usage=None):
+    """Run the specialist tasks in a thread pool, recording each wall time in `timings`."""
+    # Each worker runs in a copy of this context so it shares the run's market-data cache
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, _run_task, agent, task, on_output, usage)
+            for name, (agent, task) in specialists.items()
+        }
+        for name, future in futures.items():
+            timings[name] = future.result()
+
+
+def _run_specialists_sequential(specialists, timings, on_output=None, usage=None):
+    """Run the specialist tasks one after another in a single crew."""
+    start = time.perf_counter()
+    _crew(
+        [agent for agent, _ in specialists.values()], [task for _, task in specialists.values()], on_output, usage
+    ).kickoff()
+    timings["specialists"] = time.perf_counter() - start
+
+
+def _task_text(task):
+    output = getattr(task, "output", None)
+    return getattr(output, "raw", str(output or ""))
+
+
+def _run_debate(ticker, risk_tolerance, specialists, agents, on_output=None, fast_path=True, budget=None,
+                shared_evidence=False):
+    """
+    Debate stage over finished specialist tasks.
+
+    With `shared_evidence` the specialists reported for every risk profile,
+    and only their "Recommendation (<risk_tolerance>)" lines are read.
+
+    When every specialist made the same call with at least the budget's
+    min_confidence (see consensus.unanimous) and `fast_path` is on, the
+    moderator's LLM writes the consolidated report in a single call.
+    Otherwise the moderator runs the debate task in a crew with the
+    specialists as coworkers, under `budget`; if it is cut off, the report
+    is consolidated in one call from what the specialists produced. The
+    "debate" span carries fast_path / budget_cutoff counts for the tracing
+    summary, and every outcome is counted in consensus.path_stats().
+    """
+    budget = budget or consensus.DebateBudget()
+    reports = {name: _task_text(task) for name, (_, task) in specialists.items()}
+    profile = risk_tolerance if shared_evidence else None
+    calls = {name: consensus.extract_call(text, profile) for name, text in reports.items()}
+    agreed = consensus.unanimous(calls, budget.min_confidence)
+    moderator = agents["debate"]
+
+    def consolidate(reason):
+        report = moderator.llm.call(consensus.consolidation_messages(ticker, risk_tolerance, reports, calls, reason))
+        if on_output is not None:
+            on_output(moderator.role, report)
+        return report
+
+    path = "fast_path" if fast_path and agreed else "full_debate"
+    with span("debate", ticker, risk_tolerance=risk_tolerance, consensus=agreed, fast_path=int(path == "fast_path"),
+              budget_cutoff=0, calls={name: call["recommendation"] for name, call in calls.items()}) as attrs:
+        if path == "fast_path":
+            result = consolidate(f"All specialists recommend {agreed}; no debate is needed.")
+        else:
+            debate_task = create_debate_task(
+                ticker, risk_tolerance, context=[task for _, task in specialists.values()], agent=moderator,
+                rounds=budget.max_rounds
+            )
+            try:
+                # The specialists join as coworkers so the moderator can put questions to them
+                debaters = [moderator] + [agent for agent, _ in specialists.values()]
+                result = _crew(debaters, [debate_task], on_output, budget=budget).kickoff()
+            except consensus.DebateBudgetExceeded as e:
+                path = "budget_cutoff"
+                attrs.update(budget_cutoff=1, budget=str(e))
+                print(f"Debate for {ticker} stopped: {e}")
+                result = consolidate(f"The analysts' debate was stopped ({e}); weigh their reports yourself.")
+    consensus.record_path(path)
+    return result
+
+
+def _shared_agents():
+    return {
+        "valuation": get_agent("valuation_agent"),
+        "sentiment": get_agent("sentiment_agent"),
+        "fundamental": get_agent("fundamental_agent"),
+        "debate": get_agent("debate_manager"),
+    }
+
+
+def analyze_stock(ticker, risk_tolerance="neutral", concurrent=False, max_workers=3, timings=None, agents=None,
+                  on_output=None, fast_path=True, budget=None):
+    """
+    Run multi-agent analysis for a given stock ticker
+
+    With `concurrent=True` the valuation, sentiment and fundamental tasks run
+    at the same time (at most `max_workers` at once) and the debate starts
+    when all three are done. Per-task wall times in seconds are written to
+    `timings` when a dict is passed. `agents` is an optional team from
+    agents.create_agent_team() for runs executing alongside other runs.
+    `on_output(agent_role, task_output)` is called as each task finishes, so
+    callers can show specialist reports before the debate is done.
+
+    When the specialists agree and `fast_path` is on, the debate is replaced
+    by a single consolidation call; `budget` (a consensus.DebateBudget) caps
+    the debate otherwise.
+    """
+    print(f"Starting analysis for {ticker} with {risk_tolerance} risk tolerance...")
+    timings = {} if timings is None else timings
+    agents = agents or _shared_agents()
+    start = time.perf_counter()
+
+    # Execute with one market-data cache and page memo shared by every tool call in this run
+    with run_cache() as cache, run_pages(), span("run", ticker, risk_tolerance=risk_tolerance, concurrent=concurrent):
+        specialists = _specialist_tasks(ticker, risk_tolerance, agents)
+        if concurrent:
+            _run_specialists_concurrent(specialists, max_workers, timings, on_output)
+        else:
+            _run_specialists_sequential(specialists, timings, on_output)
+
+        # The debate only starts once every specialist has finished
+        phase_start = time.perf_counter()
+        result = _run_debate(ticker, risk_tolerance, specialists, agents, on_output, fast_path, budget)
+        timings["debate"] = time.perf_counter() - phase_start
+
+    timings["total"] = time.perf_counter() - start
+    print(f"Market data cache for {ticker}: {cache.stats()}")
+    print(f"Task wall times for {ticker}: " + ", ".join(f"{name}={seconds:.1f}s" for name, seconds in timings.items()))
+    return result
+
+
+def analyze_stock_profiles(ticker, risk_profiles=RISK_PROFILES, concurrent=False, max_workers=3, timings=None,
+                           agents=None, on_output=None, fast_path=True, budget=None):
+    """
+    Analyze `ticker` for several risk profiles from one shared set of evidence.
+
+    The valuation, sentiment and fundamental specialists run once, covering
+    every profile, and each profile then gets its own debate over those
+    outputs. Returns ({profile: result}, savings), where savings counts the
+    specialist tasks, LLM calls and tool calls that separate per-profile runs
+    would have repeated. Other arguments are as for analyze_stock().
+    """
+    risk_profiles = list(dict.fromkeys(risk_profiles))
+    print(f"Starting analysis for {ticker} with risk profiles {', '.join(risk_profiles)} (shared evidence)...")
+    timings = {} if timings is None else timings
+    agents = agents or _shared_agents()
+    specialist_usage = Counter()
+    start = time.perf_counter()
+
+    with run_cache() as cache, run_pages(), span("run", ticker, risk_tolerance="+".join(risk_profiles),
+                                                 concurrent=concurrent, shared_evidence=True) as attrs:
+        specialists = _specialist_tasks(ticker, SHARED_EVIDENCE, agents)
+        if concurrent:
+            _run_specialists_concurrent(specialists, max_workers, timings, on_output, specialist_usage)
+        else:
+            _run_specialists_sequential(specialists, timings, on_output, specialist_usage)
+
+        # One debate per profile, all reading the same specialist outputs
+        results = {}
+        for profile in risk_profiles:
+            phase_start = time.perf_counter()
+            results[profile] = _run_debate(
+                ticker, profile, specialists, agents, on_output, fast_path, budget, shared_evidence=True
+            )
+            timings[f"debate_{profile}"] = time.perf_counter() - phase_start
+
+        repeats = max(len(risk_profiles) - 1, 0)
+        savings = {
+            "profiles": len(risk_profiles),
+            "tasks_saved": repeats * len(specialists),
+            "llm_calls_saved": repeats * specialist_usage["llm_calls"],
+            "tool_calls_saved": repeats * specialist_usage["tool_calls"],
+        }
+        attrs.update(savings)
+
+    timings["total"] = time.perf_counter() - start
+    print(f"Market data cache for {ticker}: {cache.stats()}")
+    print(f"Task wall times for {ticker}: " + ", ".join(f"{name}={seconds:.1f}s" for name, seconds in timings.items()))
+    print(f"Shared evidence for {ticker} saved {savings['tasks_saved']} tasks, "
+          f"{savings['llm_calls_saved']} LLM calls and {savings['tool_calls_saved']} tool calls")
+    return results, savings
+
+
+def analyze_stock_traced(ticker, risk_tolerance="neutral", trace_dir=None, **kwargs):
+    """
+    Run analyze_stock under a tracer and return (result, summary table).
+
+    Every task, agent turn, tool call and LLM call becomes a span. When
+    `trace_dir` is given, the spans are written there as
+    `<ticker>-<run id>.json` and the summary as `<ticker>-<run id>.prom`
+    (Prometheus text format).
+    """
+    with trace_run() as tracer:
+        result = analyze_stock(ticker, risk_tolerance, **kwargs)
+    if trace_dir:
+        os.makedirs(trace_dir, exist_ok=True)
+        base = os.path.join(trace_dir, f"{ticker}-{tracer.run_id}")
+        tracer.export_json(base + ".json")
+        tracer.export_prometheus(base + ".prom")
+    return result, tracer.summary_table()
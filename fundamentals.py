@@ -0,0 +1,175 @@
+# Derived fundamentals: standard ratios over every reported period, cached per (ticker, fiscal period)
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+import market_data
+
+DEFAULT_FUNDAMENTALS_PATH = os.environ.get(
+    "FUNDAMENTALS_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".equity_research", "fundamentals.db")
+)
+
+# Line items read from the statements, with yfinance aliases tried in order
+LINE_ITEMS = {
+    "revenue": ("Total Revenue", "Operating Revenue"),
+    "gross_profit": ("Gross Profit",),
+    "operating_income": ("Operating Income", "EBIT"),
+    "net_income": ("Net Income", "Net Income Common Stockholders"),
+    "total_assets": ("Total Assets",),
+    "total_liabilities": ("Total Liabilities Net Minority Interest", "Total Liabilities"),
+    "equity": ("Stockholders Equity", "Common Stock Equity"),
+    "current_assets": ("Current Assets",),
+    "current_liabilities": ("Current Liabilities",),
+    "cash": ("Cash And Cash Equivalents", "Cash Cash Equivalents And Short Term Investments"),
+    "total_debt": ("Total Debt",),
+    "operating_cash_flow": ("Operating Cash Flow", "Cash Flow From Continuing Operating Activities"),
+    "capex": ("Capital Expenditure",),
+    "free_cash_flow": ("Free Cash Flow",),
+}
+
+RATIOS = (
+    "gross_margin", "operating_margin", "net_margin",
+    "revenue_growth_yoy", "net_income_growth_yoy",
+    "free_cash_flow", "fcf_margin",
+    "debt_to_equity", "liabilities_to_assets",
+    "current_ratio", "cash_ratio", "roe",
+)
+
+
+def _line_items(statements):
+    """One row per line item, one column per fiscal period (oldest first), NaN where not reported."""
+    frames = [frame for frame in statements.values() if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame(index=list(LINE_ITEMS), dtype=float)
+    periods = sorted(set().union(*(pd.DatetimeIndex(frame.columns) for frame in frames)))
+    rows = {}
+    for item, aliases in LINE_ITEMS.items():
+        rows[item] = pd.Series(np.nan, index=periods)
+        for frame in frames:
+            found = next((alias for alias in aliases if alias in frame.index), None)
+            if found is not None:
+                values = frame.loc[found]
+                values.index = pd.DatetimeIndex(values.index)
+                rows[item] = values.reindex(periods).astype(float)
+                break
+    return pd.DataFrame(rows).T
+
+
+def compute_ratios(statements):
+    """
+    Standard ratio set over every period in one vectorized pass.
+
+    `statements` maps "financials" / "balance_sheet" / "cash_flow" to the
+    yfinance frames. Returns a DataFrame indexed by fiscal period end (oldest
+    first) with one column per entry in RATIOS.
+    """
+    items = _line_items(statements).T  # periods x line items
+    with np.errstate(divide="ignore", invalid="ignore"):
+        revenue = items["revenue"].replace(0, np.nan)
+        fcf = items["free_cash_flow"].fillna(items["operating_cash_flow"] + items["capex"])
+        equity = items["equity"]
+        average_equity = ((equity + equity.shift(1)) / 2).fillna(equity)
+        ratios = pd.DataFrame({
+            "gross_margin": items["gross_profit"] / revenue,
+            "operating_margin": items["operating_income"] / revenue,
+            "net_margin": items["net_income"] / revenue,
+            "revenue_growth_yoy": items["revenue"].pct_change(fill_method=None),
+            "net_income_growth_yoy": items["net_income"].pct_change(fill_method=None),
+            "free_cash_flow": fcf,
+            "fcf_margin": fcf / revenue,
+            "debt_to_equity": items["total_debt"] / equity.replace(0, np.nan),
+            "liabilities_to_assets": items["total_liabilities"] / items["total_assets"].replace(0, np.nan),
+            "current_ratio": items["current_assets"] / items["current_liabilities"].replace(0, np.nan),
+            "cash_ratio": items["cash"] / items["current_liabilities"].replace(0, np.nan),
+            "roe": items["net_income"] / average_equity.replace(0, np.nan),
+        }, index=items.index)
+    return ratios.replace([np.inf, -np.inf], np.nan)
+
+
+def _fetch_statements(ticker):
+    return {
+        "financials": market_data.fetch(ticker, "financials"),
+        "balance_sheet": market_data.fetch(ticker, "balance_sheet"),
+        "cash_flow": market_data.fetch(ticker, "cashflow"),
+    }
+
+
+class FundamentalsEngine:
+    """
+    Ratio engine with a SQLite cache keyed by (ticker, fiscal period).
+
+    Ratios are recomputed only when the statements report a fiscal period
+    that is not cached yet, i.e. when a new filing has appeared.
+    """
+
+    def __init__(self, path=DEFAULT_FUNDAMENTALS_PATH, fetch_statements=_fetch_statements):
+        self.path = path
+        self.fetch_statements = fetch_statements
+        self.computations = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ratios "
+                "(ticker TEXT, period TEXT, ratios TEXT, PRIMARY KEY (ticker, period))"
+            )
+            self._schema_ready = True
+        return conn
+
+    def ratios(self, ticker):
+        """Ratios for every reported period of `ticker` (oldest first)."""
+        ticker = ticker.upper()
+        statements = self.fetch_statements(ticker)
+        periods = sorted({
+            pd.Timestamp(c).strftime("%Y-%m-%d")
+            for frame in statements.values() if frame is not None for c in frame.columns
+        })
+
+        with self._connect() as conn:
+            cached = dict(conn.execute("SELECT period, ratios FROM ratios WHERE ticker = ?", (ticker,)).fetchall())
+        if periods and all(p in cached for p in periods):
+            # Missing ratios are stored as null; cast so they come back as NaN like a fresh computation
+            return pd.DataFrame(
+                [json.loads(cached[p]) for p in periods], index=pd.DatetimeIndex(periods), columns=list(RATIOS)
+            ).astype(float)
+
+        # A new filing: recompute every period, since growth and ROE depend on the previous one
+        frame = compute_ratios(statements)
+        with self._lock:
+            self.computations += 1
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ratios VALUES (?, ?, ?)",
+                [
+                    (ticker, period.strftime("%Y-%m-%d"),
+                     json.dumps({k: (None if pd.isna(v) else float(v)) for k, v in row.items()}))
+                    for period, row in frame.iterrows()
+                ]
+            )
+        return frame
+
+    def cross_section(self, tickers, ratios=RATIOS):
+        """Latest-period ratios for many tickers as one table (rows = tickers)."""
+        rows = {}
+        for ticker in tickers:
+            try:
+                frame = self.ratios(ticker).dropna(how="all")
+            except Exception as e:
+                print(f"Fundamentals unavailable for {ticker}: {e}")
+                continue
+            if len(frame):
+                latest = frame.iloc[-1]
+                rows[ticker.upper()] = {"period": frame.index[-1].strftime("%Y-%m-%d"), **latest[list(ratios)].to_dict()}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+# Shared engine used by the financials tool
+fundamentals_engine = FundamentalsEngine()
@@ -0,0 +1,96 @@
+# Background job queue for analyses, with progressive results and shared runs per (ticker, risk, data date)
+import uuid
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class Job:
+    """State of one submitted analysis; `sections` fills in as each task finishes."""
+
+    def __init__(self, ticker, risk_tolerance, data_date):
+        self.id = uuid.uuid4().hex[:12]
+        self.ticker = ticker
+        self.risk_tolerance = risk_tolerance
+        self.data_date = data_date
+        self.status = "queued"  # queued -> running -> done / error
+        self.sections = OrderedDict()  # agent role -> report text, in completion order
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+
+class JobManager:
+    """
+    Runs analyses on a worker pool and hands out job ids.
+
+    Submissions for the same (ticker, risk tolerance, data date) share one
+    job, whether it is still running or already done, so concurrent users
+    asking for the same name trigger a single run. Up to `max_cached`
+    finished jobs are kept; failed jobs are not reused.
+
+    `runner(ticker, risk_tolerance, on_output)` performs the analysis and
+    calls `on_output(role, output)` as each task completes.
+    """
+
+    def __init__(self, runner, max_workers=2, max_cached=100):
+        self.runner = runner
+        self.max_cached = max_cached
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = {}
+        self._by_key = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, ticker, risk_tolerance, data_date=None):
+        """Queue an analysis (or join an identical one) and return its job id."""
+        ticker = ticker.strip().upper()
+        data_date = data_date or datetime.now().strftime("%Y-%m-%d")
+        key = (ticker, risk_tolerance, data_date)
+        with self._lock:
+            job = self._by_key.get(key)
+            if job is not None and job.status != "error":
+                self._by_key.move_to_end(key)
+                return job.id
+            job = Job(ticker, risk_tolerance, data_date)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._evict()
+        self._executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        """Job for `job_id`, or None if unknown or evicted."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = "running"
+
+        def on_output(role, output):
+            job.sections[role] = getattr(output, "raw", str(output))
+
+        try:
+            result = self.runner(job.ticker, job.risk_tolerance, on_output)
+            job.result = getattr(result, "raw", str(result))
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "error"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._evict()
+
+    def _evict(self):
+        # Drop the least recently requested finished jobs beyond max_cached
+        finished = [key for key, job in self._by_key.items() if job.finished]
+        for key in finished[:max(0, len(finished) - self.max_cached)]:
+            job = self._by_key.pop(key)
+            self._jobs.pop(job.id, None)
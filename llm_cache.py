@@ -0,0 +1,148 @@
+# Record/replay cache for LLM calls, keyed by a hash of model, parameters and messages
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from crewai import LLM
+from tracing import span, args_hash
+import rate_limits
+
+DEFAULT_LLM_CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".equity_research", "llm_cache.db")
+)
+
+# "off": always call the provider
+# "read_through": serve cached responses, call and store on a miss
+# "replay": serve cached responses only; a miss raises LLMCacheMiss
+LLM_CACHE_MODES = ("off", "read_through", "replay")
+
+# LLM attributes that change the response and therefore belong in the key
+KEY_PARAMS = ("temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+              "presence_penalty", "frequency_penalty", "seed", "response_format", "base_url")
+
+
+class LLMCacheMiss(LookupError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+def prompt_key(model, params, messages, tools=None):
+    """Stable SHA-256 of everything that determines the response."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    payload = {"model": model, "params": params, "messages": messages, "tools": tools}
+    encoded = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMCacheStore:
+    """SQLite table of prompt hash -> response text, shared by every CachedLLM using the same path."""
+
+    def __init__(self, path=DEFAULT_LLM_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses "
+                "(key TEXT PRIMARY KEY, model TEXT, response TEXT, stored_at REAL)"
+            )
+            self._schema_ready = True
+        return conn
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else row[0]
+
+    def put(self, key, model, response):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)",
+                (key, model, response, time.time())
+            )
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class CachedLLM(LLM):
+    """crewai LLM whose call() goes through an LLMCacheStore according to `cache_mode`."""
+
+    def __init__(self, *args, cache_mode="off", cache_store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if cache_mode not in LLM_CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{cache_mode}', expected one of {LLM_CACHE_MODES}")
+        self.cache_mode = cache_mode
+        self.cache_store = cache_store
+
+    def cache_key(self, messages, tools=None):
+        params = {name: getattr(self, name, None) for name in KEY_PARAMS}
+        return prompt_key(self.model, params, messages, tools)
+
+    def call(self, messages, tools=None, *args, **kwargs):
+        from payloads import count_tokens
+        prompt_text = messages if isinstance(messages, str) else json.dumps(messages, default=str)
+        with span("llm", self.model, prompt_tokens=count_tokens(prompt_text)) as attrs:
+            response, attrs["cache"] = self._cached_call(messages, tools, *args, **kwargs)
+            attrs["args_hash"] = args_hash(prompt_text)
+            if isinstance(response, str):
+                attrs["completion_tokens"] = count_tokens(response)
+                attrs["payload_bytes"] = len(response.encode("utf-8"))
+            return response
+
+    def _cached_call(self, messages, tools=None, *args, **kwargs):
+        """Return (response, cache outcome) according to the cache mode."""
+        # Only calls that reach the provider count against the "llm" rate limit
+        if self.cache_mode == "off":
+            rate_limits.acquire("llm")
+            return super().call(messages, tools, *args, **kwargs), "off"
+
+        key = self.cache_key(messages, tools)
+        cached = self.cache_store.get(key)
+        if cached is not None:
+            return cached, "hit"
+        if self.cache_mode == "replay":
+            raise LLMCacheMiss(f"No recorded LLM response for prompt {key[:12]} ({self.model})")
+
+        rate_limits.acquire("llm")
+        response = super().call(messages, tools, *args, **kwargs)
+        # Only plain text answers are recorded; anything else is passed through uncached
+        if isinstance(response, str):
+            self.cache_store.put(key, self.model, response)
+        return response, "miss"
+
+
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    """
+    Shared LLM for the agents, configured from the environment:
+    OPENAI_MODEL_NAME, LLM_CACHE_MODE (off / read_through / replay) and LLM_CACHE_PATH.
+    """
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            _llm = CachedLLM(
+                model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4o-mini"),
+                cache_mode=os.environ.get("LLM_CACHE_MODE", "off"),
+                cache_store=LLMCacheStore(),
+            )
+        return _llm
@@ -12,7 +12,21 @@ os.environ["TAVILY_API_KEY"] = tavily_key
 
 
 from crew import analyze_stock
+from agents import create_agent_team
 
+# Risk tolerance labels used by the Streamlit front end
+RISK_LABELS = {"Risk-Averse": "averse", "Risk-Neutral": "neutral", "Risk-Seeking": "seeking"}
+
+
+def agent_run(ticker, risk_tolerance="neutral", on_output=None):
+    """
+    Entry point for front ends: accepts UI labels such as "Risk-Neutral" and
+    runs the specialists concurrently, reporting each task through `on_output`.
+    Each call gets its own agent team, since jobs for different tickers run
+    at the same time.
+    """
+    risk_tolerance = RISK_LABELS.get(risk_tolerance, risk_tolerance)
+    return analyze_stock(ticker, risk_tolerance, concurrent=True, agents=create_agent_team(), on_output=on_output)
 
 
 # Test the implementation with a sample stock
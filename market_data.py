@@ -0,0 +1,196 @@
+# Run-scoped market-data cache shared by all tools and agents
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+import rate_limits
+
+
+def _yfinance_attr(attr):
+    """Endpoint reading one attribute of yf.Ticker under the yfinance rate limit."""
+    def fetch_attr(ticker):
+        import yfinance as yf
+        rate_limits.acquire("yfinance")
+        return getattr(yf.Ticker(ticker), attr)
+    return fetch_attr
+
+
+def _history(ticker, period="3mo", live=False):
+    """Endpoint serving daily bars from the local price store."""
+    from price_store import price_store
+    return price_store.history(ticker, period, live)
+
+
+# Provider endpoints the tools read through the cache: fn(ticker, *args, **kwargs)
+ENDPOINTS = {
+    "history": _history,
+    "financials": _yfinance_attr("financials"),
+    "balance_sheet": _yfinance_attr("balance_sheet"),
+    "cashflow": _yfinance_attr("cashflow"),
+    "info": _yfinance_attr("info"),
+}
+
+# Seconds an entry may be served from the persistent store; endpoints not listed are never persisted
+DEFAULT_TTLS = {
+    "info": 24 * 3600,
+    "financials": 7 * 24 * 3600,
+    "balance_sheet": 7 * 24 * 3600,
+    "cashflow": 7 * 24 * 3600,
+}
+
+
+class MarketDataCache:
+    """
+    LRU cache of provider responses keyed by (ticker, endpoint, args).
+
+    Concurrent requests for the same key are coalesced into a single fetch.
+    When `persist_path` is set, responses for endpoints with a TTL are also
+    kept in a SQLite file so later runs can reuse them until they expire.
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries=512, persist_path=None, ttls=None, endpoints=None):
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.endpoints = ENDPOINTS if endpoints is None else endpoints
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        if persist_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS market_data "
+                    "(key TEXT PRIMARY KEY, endpoint TEXT, value BLOB, stored_at REAL)"
+                )
+
+    def get(self, ticker, endpoint, *args, **kwargs):
+        """Return the provider response for `endpoint`, fetching it at most once per key."""
+        key = (ticker.upper(), endpoint, args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            value = self._load_persistent(key, endpoint)
+            if value is None:
+                value = self.endpoints[endpoint](ticker, *args, **kwargs)
+                with self._lock:
+                    self.misses += 1
+                self._store_persistent(key, endpoint, value)
+            else:
+                with self._lock:
+                    self.persistent_hits += 1
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stats(self):
+        """Return hit/miss counters for this cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def _connect(self):
+        return sqlite3.connect(self.persist_path, timeout=30)
+
+    def _load_persistent(self, key, endpoint):
+        if not self.persist_path or endpoint not in self.ttls:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at FROM market_data WHERE key = ?", (repr(key),)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttls[endpoint]:
+            return None
+        return pickle.loads(row[0])
+
+    def _store_persistent(self, key, endpoint, value):
+        if not self.persist_path or endpoint not in self.ttls:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO market_data VALUES (?, ?, ?, ?)",
+                (repr(key), endpoint, pickle.dumps(value), time.time())
+            )
+
+
+# The cache of the current run, and every open run (for threads that did not inherit the run's context)
+_active_cache = ContextVar("market_data_cache", default=None)
+_open_runs = []
+
+
+def get_cache():
+    """Return the cache of the current run, the latest open run, or None outside any run."""
+    cache = _active_cache.get()
+    if cache is not None:
+        return cache
+    return _open_runs[-1] if _open_runs else None
+
+
+def fetch(ticker, endpoint, *args, **kwargs):
+    """
+    Fetch `endpoint` for `ticker` through the current run's cache. Calls
+    made outside any run are not memoized, so a long-lived process always
+    sees fresh data.
+    """
+    cache = get_cache()
+    if cache is None:
+        return ENDPOINTS[endpoint](ticker, *args, **kwargs)
+    return cache.get(ticker, endpoint, *args, **kwargs)
+
+
+@contextmanager
+def run_cache(**kwargs):
+    """
+    Install a fresh MarketDataCache for the duration of one run.
+
+    Persistence across runs is enabled by passing `persist_path` or setting
+    the MARKET_DATA_CACHE_PATH environment variable.
+    """
+    kwargs.setdefault("persist_path", os.environ.get("MARKET_DATA_CACHE_PATH"))
+    cache = MarketDataCache(**kwargs)
+    token = _active_cache.set(cache)
+    _open_runs.append(cache)
+    try:
+        yield cache
+    finally:
+        _open_runs.remove(cache)
+        _active_cache.reset(token)
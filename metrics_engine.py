@@ -0,0 +1,147 @@
+# Vectorized return/risk metrics over a (dates x tickers) close-price matrix
+import warnings
+import numpy as np
+import pandas as pd
+import market_data
+
+TRADING_DAYS = 252
+
+
+def align_closes(closes):
+    """
+    Align close-price series into one matrix.
+
+    `closes` maps ticker -> pd.Series of closes indexed by date. Dates are
+    outer-joined, so a ticker that listed later or is missing bars gets NaN
+    rows. Returns (dates, tickers, matrix) with matrix shaped (dates, tickers).
+    """
+    frame = pd.DataFrame({ticker: series for ticker, series in closes.items()}).sort_index()
+    return frame.index, list(frame.columns), frame.to_numpy(dtype=float)
+
+
+def load_close_matrix(tickers, period="3mo"):
+    """Fetch closes for `tickers` through the market-data cache and align them."""
+    return align_closes({ticker: market_data.fetch(ticker, "history", period)["Close"] for ticker in tickers})
+
+
+def daily_returns(prices):
+    """
+    Simple returns per column, NaN where the bar itself is missing.
+
+    Prices are forward-filled first, so the first bar after a gap carries the
+    return across the gap instead of being dropped.
+    """
+    prices = np.asarray(prices, dtype=float)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    filled = pd.DataFrame(prices).ffill().to_numpy()
+    returns = np.full(prices.shape, np.nan)
+    returns[1:] = filled[1:] / filled[:-1] - 1
+    returns[np.isnan(prices)] = np.nan
+    return returns
+
+
+def rolling_volatility(returns, window=21, periods_per_year=TRADING_DAYS):
+    """Annualized rolling standard deviation of returns; NaN until a full window of returns is seen."""
+    valid = ~np.isnan(returns)
+    values = np.where(valid, returns, 0.0)
+    zeros = np.zeros((1, returns.shape[1]))
+    count = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    total = np.concatenate([zeros, np.cumsum(values, axis=0)])
+    total_sq = np.concatenate([zeros, np.cumsum(values ** 2, axis=0)])
+
+    out = np.full(returns.shape, np.nan)
+    if window < 2 or len(returns) < window:
+        return out
+    n = count[window:] - count[:-window]
+    s = total[window:] - total[:-window]
+    sq = total_sq[window:] - total_sq[:-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (sq - s ** 2 / n) / (n - 1)
+    var = np.where(n == window, np.maximum(var, 0.0), np.nan)
+    out[window - 1:] = np.sqrt(var) * np.sqrt(periods_per_year)
+    return out
+
+
+def compute_metrics(prices, benchmark=None, risk_free_rate=0.0, window=21, periods_per_year=TRADING_DAYS):
+    """
+    Compute return and risk metrics for every column of `prices` in one pass.
+
+    `prices` is a (dates x tickers) array of closes with NaN for missing bars.
+    `benchmark` is an optional 1-D array of benchmark closes on the same dates,
+    used for beta. Returns a dict of 1-D arrays (one value per ticker) plus the
+    (dates x tickers) `rolling_volatility` matrix.
+    """
+    prices = np.asarray(prices, dtype=float)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    returns = daily_returns(prices)
+    valid = ~np.isnan(returns)
+    n = valid.sum(axis=0)
+
+    # First and last available close per ticker
+    has_price = ~np.isnan(prices)
+    first_idx = np.argmax(has_price, axis=0)
+    last_idx = len(prices) - 1 - np.argmax(has_price[::-1], axis=0)
+    columns = np.arange(prices.shape[1])
+    first = prices[first_idx, columns]
+    last = prices[last_idx, columns]
+
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        cumulative_return = last / first - 1
+        annualized_return = np.where(n > 0, (1 + cumulative_return) ** (periods_per_year / np.maximum(n, 1)) - 1, 0.0)
+        daily_volatility = np.nanstd(returns, axis=0, ddof=1)
+        annualized_volatility = daily_volatility * np.sqrt(periods_per_year)
+
+        # Drawdown from the running peak of the forward-filled price path
+        filled = pd.DataFrame(prices).ffill().to_numpy()
+        running_peak = np.fmax.accumulate(filled, axis=0)
+        max_drawdown = np.nanmin(filled / running_peak - 1, axis=0)
+
+        # Sharpe and Sortino on daily excess returns, annualized
+        excess = returns - risk_free_rate / periods_per_year
+        mean_excess = np.nanmean(excess, axis=0)
+        sharpe = mean_excess / daily_volatility * np.sqrt(periods_per_year)
+        downside = np.sqrt(np.nanmean(np.minimum(excess, 0.0) ** 2, axis=0))
+        sortino = mean_excess / downside * np.sqrt(periods_per_year)
+
+        beta = np.full(prices.shape[1], np.nan)
+        if benchmark is not None:
+            bench_returns = daily_returns(np.asarray(benchmark, dtype=float))[:, 0]
+            pair = valid & ~np.isnan(bench_returns)[:, None]
+            r = np.where(pair, returns, np.nan)
+            b = np.where(pair, bench_returns[:, None], np.nan)
+            r_dev = r - np.nanmean(r, axis=0)
+            b_dev = b - np.nanmean(b, axis=0)
+            beta = np.nansum(r_dev * b_dev, axis=0) / np.nansum(b_dev ** 2, axis=0)
+            beta[pair.sum(axis=0) < 2] = np.nan
+
+    return {
+        "cumulative_return": cumulative_return,
+        "annualized_return": annualized_return,
+        "daily_volatility": daily_volatility,
+        "annualized_volatility": annualized_volatility,
+        "max_drawdown": max_drawdown,
+        "sharpe_ratio": sharpe,
+        "sortino_ratio": sortino,
+        "beta": beta,
+        "observations": n,
+        "rolling_volatility": rolling_volatility(returns, window, periods_per_year),
+    }
+
+
+def batch_metrics(tickers, period="3mo", benchmark=None, risk_free_rate=0.0, window=21):
+    """
+    Screen many tickers at once.
+
+    Returns a DataFrame with one row per ticker and one column per scalar
+    metric. `benchmark` is an optional ticker used for beta.
+    """
+    symbols = list(tickers) + ([benchmark] if benchmark and benchmark not in tickers else [])
+    dates, columns, matrix = load_close_matrix(symbols, period)
+    bench = matrix[:, columns.index(benchmark)] if benchmark else None
+    keep = [columns.index(ticker) for ticker in tickers]
+    metrics = compute_metrics(matrix[:, keep], bench, risk_free_rate, window)
+    metrics.pop("rolling_volatility")
+    return pd.DataFrame(metrics, index=[columns[i] for i in keep])
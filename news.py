@@ -0,0 +1,262 @@
+# Persistent news store with URL dedupe, company-name cache and record/replay of Tavily searches
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+import market_data
+import rate_limits
+
+DEFAULT_NEWS_PATH = os.environ.get(
+    "NEWS_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".equity_research", "news.db")
+)
+
+# "record": serve today's stored results, otherwise search and store
+# "replay": serve only stored results (latest day per query), never call Tavily
+# "off": always search live, store nothing
+NEWS_MODES = ("record", "replay", "off")
+
+# Query-string parameters that only track the click and never change the article
+TRACKING_PARAMS = ("utm_", "guccounter", "guce_", "fbclid", "gclid", "ncid", "cmpid", "ref")
+
+
+def normalize_url(url):
+    """Canonical form of an article URL used for dedupe."""
+    if not url:
+        return ""
+    parts = urlparse(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith(TRACKING_PARAMS)]
+    path = parts.path.rstrip("/") or "/"
+    return urlunparse(("https", host, path, "", urlencode(sorted(query)), ""))
+
+
+def article_id(article):
+    """Normalized URL, or a content hash for articles without one."""
+    url = normalize_url(article.get("url", ""))
+    if url:
+        return url
+    text = f"{article.get('title', '')}\n{article.get('body', '')}".strip().lower()
+    return "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def extract_source(url):
+    """Extract domain name from URL"""
+    if not url:
+        return "Unknown"
+    domain = urlparse(url).netloc
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain or "Unknown"
+
+
+def format_result(result):
+    """Map one Tavily result onto the article structure the sentiment tool expects."""
+    url = result.get('url', '')
+    return {
+        'title': result.get('title', 'No title'),
+        'body': result.get('content', result.get('raw_content', 'No content')),
+        # Tavily doesn't always provide exact dates, so use the current date as fallback
+        'date': result.get('published_date', datetime.now().strftime('%Y-%m-%d')),
+        'source': extract_source(url),
+        'url': url,
+    }
+
+
+def tavily_search(query, max_results):
+    """Default search backend: Tavily through langchain."""
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    rate_limits.acquire("tavily")
+    results = TavilySearchResults(max_results=max_results).invoke(query)
+    if isinstance(results, dict):
+        results = results.get('results', [])
+    return [format_result(r) for r in results if isinstance(r, dict)]
+
+
+class NewsStore:
+    """
+    SQLite-backed news layer in front of the search backend.
+
+    Searches are stored per (query, day) as lists of article ids, together
+    with the number of results requested. Articles are stored once per
+    normalized URL (or content hash), so the same story found through
+    different queries or tickers is kept only once; each search still
+    returns it. Concurrent searches for the same query and day are
+    coalesced into a single backend call.
+    """
+
+    def __init__(self, path=DEFAULT_NEWS_PATH, mode=None, search_fn=tavily_search):
+        self.path = path
+        self.mode = mode or os.environ.get("NEWS_MODE", "record")
+        if self.mode not in NEWS_MODES:
+            raise ValueError(f"Unknown news mode '{self.mode}', expected one of {NEWS_MODES}")
+        self.search_fn = search_fn
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._schema_ready = False
+
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS searches (
+                    query TEXT, day TEXT, article_ids TEXT, PRIMARY KEY (query, day));
+                CREATE TABLE IF NOT EXISTS articles (
+                    id TEXT PRIMARY KEY, title TEXT, body TEXT, date TEXT,
+                    source TEXT, url TEXT, first_seen REAL);
+                CREATE TABLE IF NOT EXISTS company_names (
+                    ticker TEXT PRIMARY KEY, name TEXT);
+            """)
+            self._schema_ready = True
+        return conn
+
+    def company_name(self, ticker):
+        """Long company name for `ticker`, looked up once and then served from the store."""
+        ticker = ticker.upper()
+        if self.mode != "off":
+            with self._connect() as conn:
+                row = conn.execute("SELECT name FROM company_names WHERE ticker = ?", (ticker,)).fetchone()
+            if row:
+                return row[0]
+            if self.mode == "replay":
+                return ticker
+        name = market_data.fetch(ticker, "info").get('longName', ticker)
+        if self.mode != "off":
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO company_names VALUES (?, ?)", (ticker, name))
+        return name
+
+    def search(self, query, max_results=5, day=None):
+        """
+        Return deduplicated articles for `query`, from the store when possible.
+
+        A stored search is reused only if it asked for at least `max_results`
+        articles; otherwise the backend is searched again (except in replay
+        mode, which returns what was recorded).
+        """
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        if self.mode == "off":
+            return self._dedupe(self.search_fn(query, max_results))[:max_results]
+
+        key = (query, day)
+        while True:
+            articles = self._stored_search(query, day, max_results)
+            if articles is not None:
+                return articles
+            if self.mode == "replay":
+                raise LookupError(f"No recorded news for query '{query}'")
+            with self._lock:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._inflight[key] = future
+            if not owner:
+                # Another run is searching this query; read its results from the store
+                future.result()
+                continue
+
+            try:
+                articles = self._search_and_store(query, day, max_results)
+                future.set_result(None)
+                return articles
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+
+    def _stored_search(self, query, day, max_results):
+        """Stored articles for `query`, or None if no stored search covers `max_results`."""
+        with self._connect() as conn:
+            if self.mode == "replay":
+                row = conn.execute(
+                    "SELECT article_ids FROM searches WHERE query = ? ORDER BY day DESC LIMIT 1", (query,)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT article_ids FROM searches WHERE query = ? AND day = ?", (query, day)
+                ).fetchone()
+            if row is None:
+                return None
+            stored = json.loads(row[0])
+            if self.mode == "replay" or stored["requested"] >= max_results:
+                return self._load_articles(conn, stored["ids"])[:max_results]
+        return None
+
+    def _search_and_store(self, query, day, max_results):
+        articles = self._dedupe(self.search_fn(query, max_results))[:max_results]
+        with self._lock, self._connect() as conn:
+            ids = []
+            for article in articles:
+                ids.append(article_id(article))
+                conn.execute(
+                    "INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (ids[-1], article.get('title'), article.get('body'), article.get('date'),
+                     article.get('source'), article.get('url'), time.time())
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?)",
+                (query, day, json.dumps({"requested": max_results, "ids": ids}))
+            )
+        return articles
+
+    def news_for_ticker(self, ticker, max_results=5):
+        """Recent news about `ticker`, searched by company name."""
+        company_name = self.company_name(ticker)
+        return self.search(f"{company_name} {ticker} stock news financial earnings", max_results)
+
+    def export_snapshot(self, path):
+        """Write every stored search and article to a JSON snapshot file."""
+        with self._connect() as conn:
+            snapshot = {
+                "searches": conn.execute("SELECT query, day, article_ids FROM searches").fetchall(),
+                "articles": conn.execute("SELECT * FROM articles").fetchall(),
+                "company_names": conn.execute("SELECT * FROM company_names").fetchall(),
+            }
+        with open(path, "w") as f:
+            json.dump(snapshot, f)
+
+    def import_snapshot(self, path):
+        """Load a JSON snapshot written by export_snapshot, e.g. to replay it offline."""
+        with open(path) as f:
+            snapshot = json.load(f)
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO searches VALUES (?, ?, ?)", snapshot["searches"])
+            conn.executemany("INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)", snapshot["articles"])
+            conn.executemany("INSERT OR REPLACE INTO company_names VALUES (?, ?)", snapshot["company_names"])
+
+    def _dedupe(self, articles):
+        seen = set()
+        unique = []
+        for article in articles:
+            key = article_id(article)
+            if key not in seen:
+                seen.add(key)
+                unique.append(article)
+        return unique
+
+    def _load_articles(self, conn, ids):
+        rows = {
+            row[0]: row for row in conn.execute(
+                f"SELECT * FROM articles WHERE id IN ({','.join('?' * len(ids))})", ids
+            )
+        } if ids else {}
+        return [
+            {'title': r[1], 'body': r[2], 'date': r[3], 'source': r[4], 'url': r[5]}
+            for r in (rows.get(i) for i in ids) if r is not None
+        ]
+
+
+# Shared store used by the news tool
+news_store = NewsStore()
@@ -0,0 +1,147 @@
+# Compact, token-budgeted encodings of price history and financial ratios for LLM context
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding files unavailable offline
+    _encoding = None
+
+
+def count_tokens(text):
+    """Token count of `text` (tiktoken when available, otherwise ~4 characters per token)."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of `n_out` points that preserve the visual shape of
+    the (x, y) series; the first and last points are always kept.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = [0]
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        prev = selected[-1]
+        area = np.abs(
+            (x[prev] - avg_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (avg_y - y[prev])
+        )
+        selected.append(start + int(np.argmax(area)))
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+def _finalize(payload, source_chars):
+    """Attach token accounting to `payload` and return it as a compact JSON string."""
+    payload["source_tokens_est"] = (source_chars + 3) // 4
+    payload["payload_tokens"] = 0
+    text = _dumps(payload)
+    payload["payload_tokens"] = count_tokens(text)
+    return _dumps(payload)
+
+
+def summarize_history(hist):
+    """Precomputed statistics over the full OHLCV history."""
+    close = hist["Close"].dropna()
+    returns = close.pct_change().dropna()
+    return {
+        "start": hist.index[0].strftime("%Y-%m-%d"),
+        "end": hist.index[-1].strftime("%Y-%m-%d"),
+        "bars": int(len(hist)),
+        "first_close": round(float(close.iloc[0]), 2),
+        "last_close": round(float(close.iloc[-1]), 2),
+        "high": round(float(hist["High"].max()), 2),
+        "high_date": hist["High"].idxmax().strftime("%Y-%m-%d"),
+        "low": round(float(hist["Low"].min()), 2),
+        "low_date": hist["Low"].idxmin().strftime("%Y-%m-%d"),
+        "return_pct": round(float(close.iloc[-1] / close.iloc[0] - 1) * 100, 2),
+        "daily_vol_pct": round(float(returns.std()) * 100, 3) if len(returns) > 1 else None,
+        "avg_volume": int(hist["Volume"].mean()),
+    }
+
+
+def encode_history(hist, token_budget=1500):
+    """
+    Encode an OHLCV frame as summary stats plus an LTTB-downsampled close/volume series.
+
+    The number of points starts from what the budget can hold and shrinks
+    until the payload fits `token_budget`.
+    """
+    hist = hist.dropna(subset=["Close"])
+    if len(hist) == 0:
+        return _finalize({"summary": {"bars": 0}, "series": []}, 0)
+    x = np.arange(len(hist))
+    summary = summarize_history(hist)
+    source_chars = len(hist.to_json())
+    closes = hist["Close"].to_numpy(dtype=float)
+    rounded = np.round(closes, 2).tolist()
+    volumes = hist["Volume"].to_numpy().tolist()
+    dates = hist.index.strftime("%Y-%m-%d").tolist()
+
+    def payload_for(idx):
+        rows = [[dates[i], rounded[i], int(volumes[i])] for i in idx]
+        return {"summary": summary, "columns": ["date", "close", "volume"], "series": rows}
+
+    # Estimate how many rows fit from the cost of the empty payload and of the last row
+    fixed = count_tokens(_dumps(payload_for([])))
+    per_row = count_tokens(_dumps(payload_for([len(hist) - 1])["series"][0])) + 1
+    n_points = min(len(hist), max(3, (token_budget - fixed) // per_row))
+    while True:
+        payload = payload_for(lttb(x, closes, n_points))
+        tokens = count_tokens(_dumps(payload))
+        if n_points <= 3 or tokens <= token_budget:
+            break
+        n_points = max(3, min(n_points - 1, int(n_points * token_budget / tokens)))
+    payload["downsampled_from"] = int(len(hist))
+    return _finalize(payload, source_chars)
+
+
+def encode_ratios(ratios, token_budget=1500):
+    """
+    Encode a ratio table (rows = fiscal periods, oldest first) newest period first.
+
+    Margins, growth and returns are fractions; free_cash_flow is in millions.
+    The oldest periods are dropped until the payload fits `token_budget`.
+    """
+    ratios = ratios.dropna(how="all").iloc[::-1]
+    source_chars = len(ratios.to_json())
+    for keep in range(len(ratios), 0, -1):
+        frame = ratios.iloc[:keep]
+        payload = {
+            "units": "fractions; free_cash_flow in millions",
+            "periods": [pd.Timestamp(p).strftime("%Y-%m-%d") for p in frame.index],
+            "ratios": {
+                name: [
+                    None if pd.isna(v) else round(float(v) / (1e6 if name == "free_cash_flow" else 1), 4)
+                    for v in frame[name]
+                ]
+                for name in frame.columns
+            },
+        }
+        if keep == 1 or count_tokens(_dumps(payload)) <= token_budget:
+            break
+    else:
+        payload = {"periods": [], "ratios": {}}
+    return _finalize(payload, source_chars)
@@ -0,0 +1,185 @@
+# Local on-disk price-history store shared by the history tools
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+import rate_limits
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+DEFAULT_STORE_DIR = os.environ.get(
+    "PRICE_STORE_DIR",
+    os.path.join(os.path.expanduser("~"), ".equity_research", "prices")
+)
+
+# yfinance counts these periods in trading sessions: the last N bars
+SESSION_PERIODS = {"1d": 1, "5d": 5}
+
+# yfinance period strings mapped to calendar offsets; the session periods get a window
+# wide enough to hold their sessions across weekends and holidays
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=7),
+    "5d": pd.DateOffset(days=14),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+
+def yfinance_fetcher(ticker, start=None, end=None):
+    """Default fetcher: daily bars from yfinance between start and end (None = open ended)."""
+    import yfinance as yf
+    rate_limits.acquire("yfinance")
+    stock = yf.Ticker(ticker)
+    if start is None and end is None:
+        return stock.history(period="max")
+    return stock.history(start=start, end=end)
+
+
+def period_start(period, today):
+    """Return the first date covered by a yfinance period string, or None for 'max'."""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=today.year, month=1, day=1)
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period '{period}'")
+    return today - PERIOD_OFFSETS[period]
+
+
+def _normalize_frame(frame):
+    """Keep the OHLCV columns and index bars by tz-naive calendar date."""
+    if frame is None or len(frame) == 0:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+    frame = frame.reindex(columns=COLUMNS).astype(float)
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    frame.index = index.normalize()
+    return frame
+
+
+class PriceStore:
+    """
+    Per-ticker daily bar store kept as memory-mapped NumPy arrays.
+
+    Each ticker is stored as three files in `store_dir`:
+    `<TICKER>.dates.npy` (int64 nanoseconds), `<TICKER>.values.npy`
+    (float64, one column per entry in COLUMNS) and `<TICKER>.json` with the
+    first date the store is known to cover and the day it was last refreshed.
+    Only bars from the last stored date on (or before the first covered
+    date, when a longer period is requested) are fetched; any period is then
+    served by slicing what is on disk. Each ticker has its own lock, so
+    refreshes of different tickers download in parallel. The latest bars
+    are fetched at most once a day, unless `live` asks for the current
+    session.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, fetcher=yfinance_fetcher):
+        self.store_dir = store_dir
+        self.fetcher = fetcher
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _ticker_lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker.upper(), threading.RLock())
+
+    def history(self, ticker, period="3mo", live=False):
+        """
+        Return OHLCV bars for `ticker` over `period` ("1d"/"5d" are sessions),
+        refreshing the store as needed; `live` refetches the latest bars even
+        if the store was refreshed today.
+        """
+        today = pd.Timestamp.today().normalize()
+        start = period_start(period, today)
+        with self._ticker_lock(ticker):
+            self.refresh(ticker, start=start, today=today, live=live)
+            frame = self.load(ticker)
+        if period in SESSION_PERIODS:
+            return frame.iloc[-SESSION_PERIODS[period]:]
+        if start is not None:
+            frame = frame[frame.index >= start]
+        return frame
+
+    def refresh(self, ticker, start=None, today=None, live=False):
+        """Bring the stored bars for `ticker` up to `today` (now, if `live`), backfilling to `start` if needed."""
+        today = today if today is not None else pd.Timestamp.today().normalize()
+        with self._ticker_lock(ticker):
+            meta = self._read_meta(ticker)
+            if meta is None:
+                frame = _normalize_frame(self.fetcher(ticker, start, None))
+                self._write(ticker, frame, covered_from=start, refreshed=today)
+                return
+
+            covered_from = pd.Timestamp(meta["covered_from"]) if meta["covered_from"] else None
+            refreshed = pd.Timestamp(meta["refreshed"])
+            new_frames = []
+
+            # Backfill when a longer period than the store covers is requested
+            if covered_from is not None and (start is None or start < covered_from):
+                new_frames.append(_normalize_frame(self.fetcher(ticker, start, covered_from)))
+                covered_from = start
+
+            # Fetch only the bars from the last stored date on, at most once a day unless live.
+            # The last bar is fetched again because it may have been stored mid-session
+            if refreshed < today or live:
+                dates, _ = self._read_arrays(ticker)
+                since = pd.Timestamp(dates[-1]) if len(dates) else covered_from
+                new_frames.append(_normalize_frame(self.fetcher(ticker, since, None)))
+                refreshed = today
+
+            if new_frames:
+                frame = pd.concat([self.load(ticker)] + new_frames)
+                frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+                self._write(ticker, frame, covered_from=covered_from, refreshed=refreshed)
+
+    def load(self, ticker):
+        """Return everything stored for `ticker` as a DataFrame (empty if nothing is stored)."""
+        dates, values = self._read_arrays(ticker)
+        return pd.DataFrame(np.array(values), index=pd.DatetimeIndex(np.array(dates)), columns=COLUMNS)
+
+    def _path(self, ticker, suffix):
+        return os.path.join(self.store_dir, f"{ticker.upper()}.{suffix}")
+
+    def _read_meta(self, ticker):
+        path = self._path(ticker, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _read_arrays(self, ticker):
+        dates_path = self._path(ticker, "dates.npy")
+        if not os.path.exists(dates_path):
+            return np.array([], dtype="datetime64[ns]"), np.empty((0, len(COLUMNS)))
+        dates = np.load(dates_path, mmap_mode="r").view("datetime64[ns]")
+        values = np.load(self._path(ticker, "values.npy"), mmap_mode="r")
+        return dates, values
+
+    def _write(self, ticker, frame, covered_from, refreshed):
+        os.makedirs(self.store_dir, exist_ok=True)
+        dates = frame.index.values.astype("datetime64[ns]").view("int64")
+        values = frame[COLUMNS].to_numpy(dtype=float)
+        # Write to temporary files first so readers never see a half-written ticker
+        for suffix, array in (("dates.npy", dates), ("values.npy", values)):
+            tmp = self._path(ticker, suffix + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, self._path(ticker, suffix))
+        meta = {
+            "covered_from": covered_from.strftime("%Y-%m-%d") if covered_from is not None else None,
+            "refreshed": refreshed.strftime("%Y-%m-%d"),
+        }
+        tmp = self._path(ticker, "json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(ticker, "json"))
+
+
+# Shared store used by the history and metrics tools
+price_store = PriceStore()
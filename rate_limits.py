@@ -0,0 +1,61 @@
+# Per-provider token-bucket rate limits shared by every run in the process
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens are added per second up to `capacity`.
+
+    acquire() blocks until enough tokens are available. A bucket with
+    rate=None never blocks.
+    """
+
+    def __init__(self, rate=None, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate or 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """Take `tokens` from the bucket, sleeping until they are available."""
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Providers the tools and crews call out to; unlimited until configured
+_buckets = {
+    "yfinance": TokenBucket(),
+    "tavily": TokenBucket(),
+    "llm": TokenBucket(),
+    "web": TokenBucket(),
+}
+
+
+def configure(limits):
+    """
+    Set rate limits from a mapping of provider -> requests per second.
+
+    A value may also be a (rate, capacity) tuple; None removes the limit.
+    """
+    for provider, limit in limits.items():
+        rate, capacity = limit if isinstance(limit, tuple) else (limit, None)
+        _buckets[provider] = TokenBucket(rate, capacity)
+
+
+def acquire(provider, tokens=1.0):
+    """Block until `provider` may be called again."""
+    bucket = _buckets.get(provider)
+    if bucket is not None:
+        bucket.acquire(tokens)
@@ -0,0 +1,449 @@
+# Web page fetching for the scrape tool: pooled keep-alive connections, per-host limits,
+# a conditional-GET disk cache and main-text extraction
+import os
+import json
+import time
+import tempfile
+import zlib
+import hashlib
+import threading
+import contextvars
+import http.client
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urljoin
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import rate_limits
+
+DEFAULT_PAGE_CACHE_DIR = os.environ.get(
+    "SCRAPE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".equity_research", "pages")
+)
+
+USER_AGENT = "Mozilla/5.0 (compatible; equity-research/1.0)"
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections shared by every fetch in the process.
+
+    At most `max_per_host` requests run against one host at a time; idle
+    connections are kept per host and reused by the next request.
+    """
+
+    def __init__(self, max_per_host=4, timeout=15.0):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle = {}
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, key):
+        with self._lock:
+            if key not in self._host_limits:
+                self._host_limits[key] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[key]
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self.connections_opened += 1
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def get(self, url, headers=None, max_bytes=None):
+        """
+        GET `url` (no redirect handling). Returns (status, headers with
+        lower-case names, body); the body is cut at `max_bytes`.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        with self._host_limit(key):
+            while True:
+                conn, reused = self._checkout(key)
+                try:
+                    conn.request("GET", target, headers=headers or {})
+                    response = conn.getresponse()
+                    body = response.read(max_bytes + 1) if max_bytes else response.read()
+                except (ConnectionError, http.client.HTTPException):
+                    conn.close()
+                    if reused:
+                        continue  # The server closed an idle keep-alive connection; retry on a fresh one
+                    raise
+                except Exception:
+                    conn.close()
+                    raise
+                truncated = max_bytes is not None and len(body) > max_bytes
+                # A partly read response leaves the connection unusable
+                if response.will_close or truncated:
+                    conn.close()
+                else:
+                    self._checkin(key, conn)
+                return response.status, {k.lower(): v for k, v in response.getheaders()}, body[:max_bytes]
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class PageCache:
+    """Raw page bodies on disk with their ETag / Last-Modified validators, one pair of files per URL."""
+
+    def __init__(self, cache_dir=DEFAULT_PAGE_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.json"), os.path.join(self.cache_dir, f"{name}.body")
+
+    def get(self, url):
+        """(meta, body) for `url`, or None if it was never stored."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, meta, body=None):
+        """Store `meta` (and `body` when given); the meta file is written last so readers never see a partial entry."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        if body is not None:
+            self._replace(body_path, "wb", lambda f: f.write(body))
+        self._replace(meta_path, "w", lambda f: json.dump(meta, f))
+
+    def _replace(self, path, mode, write):
+        # A unique temporary name per writer, so threads storing the same URL never share a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+class PageMemo:
+    """
+    Pages fetched during one run, keyed by URL.
+
+    Concurrent requests for the same URL are coalesced into a single fetch.
+    Failed fetches are not kept, so a later request tries again.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._pages = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, fetch):
+        """Page for `url`, calling `fetch(url)` at most once per URL."""
+        with self._lock:
+            if url in self._pages:
+                self.hits += 1
+                return self._pages[url]
+            future = self._inflight.get(url)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[url] = future
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            page = fetch(url)
+            with self._lock:
+                self.misses += 1
+                self._pages[url] = page
+            future.set_result(page)
+            return page
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[url]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "pages": len(self._pages)}
+
+
+# The page memo of the current run, and every open run (for threads that did not inherit the run's context)
+_active_memo = ContextVar("page_memo", default=None)
+_open_runs = []
+
+
+def get_memo():
+    """Return the page memo of the current run, the latest open run, or None outside any run."""
+    memo = _active_memo.get()
+    if memo is not None:
+        return memo
+    return _open_runs[-1] if _open_runs else None
+
+
+@contextmanager
+def run_pages():
+    """Install a fresh PageMemo for the duration of one run."""
+    memo = PageMemo()
+    token = _active_memo.set(memo)
+    _open_runs.append(memo)
+    try:
+        yield memo
+    finally:
+        _open_runs.remove(memo)
+        _active_memo.reset(token)
+
+
+class _MainTextParser(HTMLParser):
+    """Collects visible text, separately for the whole page and for <main>/<article> content."""
+
+    SKIP = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "iframe", "head"}
+    MAIN = {"main", "article"}
+    BLOCKS = {"p", "div", "section", "li", "tr", "br", "table", "blockquote", "pre",
+              "h1", "h2", "h3", "h4", "h5", "h6", "main", "article", "ul", "ol"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.in_title = False
+        self.title = []
+        self.text = []
+        self.main_text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self.in_title = True
+        if tag in self.SKIP:
+            self.skip_depth += 1
+        elif tag in self.MAIN:
+            self.main_depth += 1
+        if tag in self.BLOCKS:
+            self._append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        if tag in self.SKIP:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in self.MAIN:
+            self.main_depth = max(0, self.main_depth - 1)
+        if tag in self.BLOCKS:
+            self._append("\n")
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif not self.skip_depth:
+            self._append(data)
+
+    def _append(self, data):
+        self.text.append(data)
+        if self.main_depth:
+            self.main_text.append(data)
+
+
+def _clean(chunks):
+    lines = (" ".join(line.split()) for line in "".join(chunks).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def extract_main_text(html):
+    """
+    (title, text) of an HTML page without scripts, styles and navigation.
+
+    The <main>/<article> content is used when it holds a substantial part of
+    the page, otherwise all visible text.
+    """
+    parser = _MainTextParser()
+    parser.feed(html)
+    parser.close()
+    text = _clean(parser.text)
+    main_text = _clean(parser.main_text)
+    if len(main_text) >= max(200, len(text) // 4):
+        text = main_text
+    return _clean(parser.title), text
+
+
+def cap_text(text, token_budget):
+    """Cut `text` at a word boundary to about `token_budget` tokens; returns (text, truncated)."""
+    from payloads import count_tokens
+    tokens = count_tokens(text)
+    if tokens <= token_budget:
+        return text, False
+    while tokens > token_budget:
+        cut = text[:int(len(text) * token_budget / tokens * 0.95)]
+        text = cut.rsplit(None, 1)[0] if " " in cut else cut
+        tokens = count_tokens(text)
+    return text + " …", True
+
+
+def _decode(body, headers):
+    encoding = headers.get("content-encoding", "").lower()
+    # Decompressor objects also accept a body cut short at max_bytes
+    if encoding == "gzip":
+        body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body)
+    elif encoding == "deflate":
+        try:
+            body = zlib.decompressobj().decompress(body)
+        except zlib.error:
+            body = zlib.decompressobj(-zlib.MAX_WBITS).decompress(body)  # Raw deflate without the zlib header
+    charset = "utf-8"
+    for part in headers.get("content-type", "").split(";")[1:]:
+        name, _, value = part.strip().partition("=")
+        if name.lower() == "charset" and value:
+            charset = value.strip('"')
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+class Scraper:
+    """
+    Fetches pages through a shared ConnectionPool and a conditional-GET PageCache.
+
+    A page checked within `max_age` seconds is served from disk; older pages
+    are revalidated with If-None-Match / If-Modified-Since, so an unchanged
+    page costs a 304 instead of a download. Within a run (see run_pages()),
+    each URL is fetched once and shared by every agent.
+    """
+
+    def __init__(self, pool=None, cache_dir=DEFAULT_PAGE_CACHE_DIR, max_age=3600, max_workers=8,
+                 max_bytes=2 * 2**20):
+        self.pool = pool or ConnectionPool()
+        self.cache = PageCache(cache_dir)
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.counts = {"network": 0, "revalidated": 0, "disk": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self.counts, "connections_opened": self.pool.connections_opened}
+
+    def fetch(self, url):
+        """
+        Fetch and extract one page, bypassing the run memo. Returns a dict
+        with url, status, title, text and source ("network", "revalidated"
+        or "disk"), or url, status and error.
+        """
+        cached = self.cache.get(url)
+        if cached is not None and time.time() - cached[0]["checked_at"] < self.max_age:
+            self._count("disk")
+            return self._page(url, cached[0], cached[1], "disk")
+
+        headers = {"User-Agent": USER_AGENT, "Accept": "text/html,*/*;q=0.8", "Accept-Encoding": "gzip, deflate"}
+        if cached is not None:
+            if cached[0].get("etag"):
+                headers["If-None-Match"] = cached[0]["etag"]
+            if cached[0].get("last_modified"):
+                headers["If-Modified-Since"] = cached[0]["last_modified"]
+
+        target = url
+        for _ in range(MAX_REDIRECTS + 1):
+            rate_limits.acquire("web")
+            status, response_headers, body = self.pool.get(target, headers, self.max_bytes)
+            if status not in REDIRECT_STATUSES or "location" not in response_headers:
+                break
+            target = urljoin(target, response_headers["location"])
+
+        if status == 304 and cached is not None:
+            meta = {**cached[0], "checked_at": time.time()}
+            self.cache.put(url, meta)
+            self._count("revalidated")
+            return self._page(url, meta, cached[1], "revalidated")
+        if status != 200:
+            self._count("errors")
+            return {"url": url, "status": status, "error": f"HTTP {status}"}
+
+        meta = {
+            "url": url,
+            "final_url": target,
+            "etag": response_headers.get("etag"),
+            "last_modified": response_headers.get("last-modified"),
+            "content_type": response_headers.get("content-type", ""),
+            "content_encoding": response_headers.get("content-encoding", ""),
+            "checked_at": time.time(),
+        }
+        self.cache.put(url, meta, body)
+        self._count("network")
+        return self._page(url, meta, body, "network")
+
+    def _page(self, url, meta, body, source):
+        headers = {"content-type": meta["content_type"], "content-encoding": meta["content_encoding"]}
+        content = _decode(body, headers)
+        if "html" in meta["content_type"] or content.lstrip()[:1] == "<":
+            title, text = extract_main_text(content)
+        else:
+            title, text = "", content
+        return {"url": url, "status": 200, "title": title, "text": text, "source": source}
+
+    def page(self, url):
+        """Page for `url`, fetched at most once per run (concurrent requests for it are coalesced)."""
+        memo = get_memo()
+        return self.fetch(url) if memo is None else memo.get(url, self.fetch)
+
+    def scrape(self, urls, token_budget=1500):
+        """
+        Fetch `urls` concurrently (duplicates once) and cap the extracted
+        text so all pages together stay within about `token_budget` tokens.
+        """
+        urls = [url.strip() for url in urls if url and url.strip()]
+        urls = list(dict.fromkeys(url if "://" in url else f"https://{url}" for url in urls))
+        if not urls:
+            return []
+        # Workers run in a copy of this context so they share the run's page memo
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, self.page, url) for url in urls]
+            pages = []
+            for url, future in zip(urls, futures):
+                try:
+                    pages.append(dict(future.result()))
+                except Exception as e:
+                    self._count("errors")
+                    pages.append({"url": url, "error": f"{type(e).__name__}: {e}"})
+
+        per_page = max(token_budget // len(urls), 100)
+        for page in pages:
+            if "text" in page:
+                page["text"], page["truncated"] = cap_text(page["text"], per_page)
+        return pages
+
+
+# Shared scraper behind the scrape tool
+scraper = Scraper()
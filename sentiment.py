@@ -0,0 +1,139 @@
+# Compiled, negation-aware keyword sentiment scoring over many articles at once
+import os
+import re
+import json
+import numpy as np
+
+DEFAULT_POSITIVE = ['buy', 'strong', 'growth', 'positive', 'outperform',
+                    'upgrade', 'bullish', 'profit', 'gain', 'beat', 'raise',
+                    'strong buy', 'overweight', 'earnings beat',
+                    'revenue growth', 'profitability', 'innovation']
+DEFAULT_NEGATIVE = ['sell', 'weak', 'decline', 'negative', 'underperform',
+                    'downgrade', 'bearish', 'loss', 'drop', 'miss', 'cut',
+                    'reduce', 'underweight', 'earnings miss', 'layoff',
+                    'lawsuit', 'investigation', 'declining']
+DEFAULT_NEGATORS = ['not', 'no', 'never', 'without', "isn't", "wasn't", "didn't",
+                    "doesn't", "won't", 'failed to', 'fails to', 'unlikely to']
+
+# Separator between articles in the combined text; never matches a term or a negator
+_SEPARATOR = "\n\x00\n"
+
+
+class SentimentLexicon:
+    """
+    Weighted keyword lexicon compiled into a single word-boundary regex.
+
+    Alternatives are ordered longest first, so at any position the longest
+    phrase wins ("strong buy" rather than "strong") and matches never
+    overlap. A term preceded by a negator within `negation_window` words has
+    its weight flipped.
+    """
+
+    def __init__(self, weights, negators=DEFAULT_NEGATORS, negation_window=3):
+        self.weights = {term.strip().lower(): float(weight) for term, weight in weights.items() if term.strip()}
+        if not self.weights:
+            # An empty alternation would match the empty string at every word boundary
+            raise ValueError("Sentiment lexicon has no positive or negative terms")
+        self.negators = [n.strip().lower() for n in negators if n.strip()]
+        self.negation_window = negation_window
+
+        def alternation(words):
+            return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+        parts = [rf"(?P<term>\b(?:{alternation(self.weights)})\b)"]
+        if self.negators:
+            parts.insert(0, rf"(?P<neg>\b(?:{alternation(self.negators)})(?!\w))")
+        self.pattern = re.compile("|".join(parts), re.IGNORECASE)
+
+    @classmethod
+    def default(cls):
+        """The original keyword lists, every term weighted +1 or -1."""
+        weights = {term: 1.0 for term in DEFAULT_POSITIVE}
+        weights.update({term: -1.0 for term in DEFAULT_NEGATIVE})
+        return cls(weights)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a lexicon from JSON:
+        {"positive": {"term": weight, ...}, "negative": {"term": weight, ...},
+         "negators": [...], "negation_window": 3}
+        Negative weights are stored as given or negated if positive. Lists of
+        terms instead of mappings get weight 1.
+        """
+        with open(path) as f:
+            spec = json.load(f)
+
+        def as_weights(terms):
+            return terms if isinstance(terms, dict) else {term: 1.0 for term in terms}
+
+        weights = {term: abs(w) for term, w in as_weights(spec.get("positive", {})).items()}
+        weights.update({term: -abs(w) for term, w in as_weights(spec.get("negative", {})).items()})
+        return cls(
+            weights,
+            negators=spec.get("negators", DEFAULT_NEGATORS),
+            negation_window=spec.get("negation_window", 3),
+        )
+
+    def score_texts(self, texts):
+        """
+        Score many texts in one regex pass over their concatenation.
+
+        Returns a columnar dict of NumPy arrays, one entry per text:
+        score, positive_hits, negative_hits and negated_hits.
+        """
+        texts = [t or "" for t in texts]
+        n = len(texts)
+        # Start offset of each text inside the combined string
+        lengths = np.fromiter((len(t) + len(_SEPARATOR) for t in texts), dtype=np.int64, count=n)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if n else np.array([], dtype=np.int64)
+        combined = _SEPARATOR.join(texts)
+
+        score = np.zeros(n)
+        positive = np.zeros(n, dtype=np.int64)
+        negative = np.zeros(n, dtype=np.int64)
+        negated = np.zeros(n, dtype=np.int64)
+
+        doc = 0
+        last_neg_end = -1
+        last_neg_doc = -1
+        for match in self.pattern.finditer(combined):
+            pos = match.start()
+            while doc + 1 < n and starts[doc + 1] <= pos:
+                doc += 1
+            if match.lastgroup == "neg":
+                last_neg_end, last_neg_doc = match.end(), doc
+                continue
+
+            weight = self.weights[match.group().lower()]
+            # Negation applies only inside the same text and within the word window
+            if last_neg_doc == doc and len(combined[last_neg_end:pos].split()) < self.negation_window:
+                weight = -weight
+                negated[doc] += 1
+            score[doc] += weight
+            if weight > 0:
+                positive[doc] += 1
+            elif weight < 0:
+                negative[doc] += 1
+
+        return {
+            "score": score,
+            "positive_hits": positive,
+            "negative_hits": negative,
+            "negated_hits": negated,
+        }
+
+
+def score_articles(articles, lexicon=None):
+    """Score article dicts (title/body) with `lexicon` (the default lexicon if None)."""
+    lexicon = lexicon or default_lexicon
+    return lexicon.score_texts(
+        [f"{item.get('title', '')} {item.get('body', '')}" for item in articles]
+    )
+
+
+# Lexicon used by the sentiment tool; SENTIMENT_LEXICON_PATH points at a JSON lexicon to use instead
+default_lexicon = (
+    SentimentLexicon.from_file(os.environ["SENTIMENT_LEXICON_PATH"])
+    if os.environ.get("SENTIMENT_LEXICON_PATH") else SentimentLexicon.default()
+)
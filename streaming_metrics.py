@@ -0,0 +1,387 @@
+# Incremental return/risk metrics: O(1) work per appended bar, serializable state per ticker
+import os
+import json
+import math
+import threading
+from collections import deque
+import market_data
+from metrics_engine import TRADING_DAYS, align_closes
+
+DEFAULT_STREAMING_METRICS_PATH = os.environ.get(
+    "STREAMING_METRICS_PATH",
+    os.path.join(os.path.expanduser("~"), ".equity_research", "streaming_metrics.json")
+)
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _date_key(date):
+    if date is None:
+        return None
+    # Timestamps compare as ISO strings; anything else (bar numbers, strings) as given
+    return date.isoformat() if hasattr(date, "isoformat") else date
+
+
+def _json_safe(value):
+    # NaN is not valid JSON; store it as null
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (list, tuple, deque)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    return value
+
+
+def _from_json(value):
+    return math.nan if value is None else value
+
+
+def _same_value(a, b):
+    return (_is_missing(a) and _is_missing(b)) or (not _is_missing(a) and not _is_missing(b) and float(a) == float(b))
+
+
+# Scalar state saved before each bar so the last bar can be replaced by a revised one
+_SCALARS = (
+    "last_date", "first_close", "last_close", "peak", "max_drawdown", "n", "mean", "m2", "downside_sq",
+    "last_benchmark", "pairs", "pair_mean_r", "pair_mean_b", "co_moment", "bench_m2",
+    "ring_n", "ring_mean", "ring_m2", "ring_pushes",
+)
+
+
+class StreamingMetrics:
+    """
+    Running metrics for one ticker, updated bar by bar.
+
+    Mirrors metrics_engine.compute_metrics over every bar seen so far:
+    Welford accumulators for the mean and variance of returns (and the
+    return/benchmark co-moment for beta), a running peak for drawdown and
+    ring buffers for the rolling volatility window and the moving averages.
+    A missing bar (close None/NaN) advances the windows without a return,
+    and the next close carries the return across the gap, like the batch
+    engine's forward fill. The state before the last bar is kept, so a
+    revised close for the last date (an intraday update of the current
+    session) replaces that bar instead of being dropped.
+    """
+
+    def __init__(self, window=21, sma_windows=(20, 50), risk_free_rate=0.0, periods_per_year=TRADING_DAYS):
+        self.window = window
+        self.sma_windows = tuple(sma_windows)
+        self.risk_free_rate = risk_free_rate
+        self.periods_per_year = periods_per_year
+
+        self.last_date = None
+        self.first_close = math.nan
+        self.last_close = math.nan
+        self.peak = math.nan
+        self.max_drawdown = math.nan
+
+        # Welford over every return
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_sq = 0.0
+
+        # Bivariate Welford over (return, benchmark return) pairs
+        self.last_benchmark = math.nan
+        self.pairs = 0
+        self.pair_mean_r = 0.0
+        self.pair_mean_b = 0.0
+        self.co_moment = 0.0
+        self.bench_m2 = 0.0
+
+        # Sliding Welford over the last `window` bars; None marks a bar without a return
+        self.ring = deque(maxlen=window)
+        self.ring_n = 0
+        self.ring_mean = 0.0
+        self.ring_m2 = 0.0
+        self.ring_pushes = 0
+
+        # Last closes and their sum for each moving average
+        self.sma_rings = {w: deque(maxlen=w) for w in self.sma_windows}
+        self.sma_sums = {w: 0.0 for w in self.sma_windows}
+
+        # What the last bar changed, to undo it when that bar is revised
+        self.undo = None
+
+    def update(self, close, date=None, benchmark_close=None):
+        """
+        Append one bar, or replace the last one when `date` equals its date.
+
+        Returns False (and changes nothing) if `date` is before the last bar
+        seen, or repeats it with the same closes, so replaying a feed after a
+        restart is safe.
+        """
+        key = _date_key(date)
+        if key is not None and self.last_date is not None and key <= self.last_date:
+            if key < self.last_date or self.undo is None:
+                return False
+            if _same_value(close, self.undo["close"]) and _same_value(benchmark_close, self.undo["benchmark_close"]):
+                return False
+            self._rollback()
+        self._checkpoint(close, benchmark_close)
+        if key is not None:
+            self.last_date = key
+
+        ret = None
+        if not _is_missing(close):
+            close = float(close)
+            if math.isnan(self.first_close):
+                self.first_close = close
+                self.peak = close
+                self.max_drawdown = 0.0
+            else:
+                if not math.isnan(self.last_close):
+                    ret = close / self.last_close - 1
+                self.peak = max(self.peak, close)
+                self.max_drawdown = min(self.max_drawdown, close / self.peak - 1)
+            self.last_close = close
+            self._update_smas(close)
+
+        bench_ret = None
+        if not _is_missing(benchmark_close):
+            benchmark_close = float(benchmark_close)
+            if not math.isnan(self.last_benchmark):
+                bench_ret = benchmark_close / self.last_benchmark - 1
+            self.last_benchmark = benchmark_close
+
+        if ret is not None:
+            self._add_return(ret)
+            if bench_ret is not None:
+                self._add_pair(ret, bench_ret)
+        self._push_window(ret)
+        return True
+
+    def _checkpoint(self, close, benchmark_close):
+        ring_full = len(self.ring) == self.window
+        self.undo = {
+            "close": None if _is_missing(close) else float(close),
+            "benchmark_close": None if _is_missing(benchmark_close) else float(benchmark_close),
+            "scalars": {name: getattr(self, name) for name in _SCALARS},
+            "sma_sums": dict(self.sma_sums),
+            "ring_full": ring_full,
+            "ring_evicted": self.ring[0] if ring_full else None,
+            "sma_evicted": {w: ring[0] if len(ring) == w else None for w, ring in self.sma_rings.items()},
+        }
+
+    def _rollback(self):
+        undo, self.undo = self.undo, None
+        for name, value in undo["scalars"].items():
+            setattr(self, name, value)
+        self.sma_sums = dict(undo["sma_sums"])
+        self.ring.pop()
+        if undo["ring_full"]:
+            self.ring.appendleft(undo["ring_evicted"])
+        if not _is_missing(undo["close"]):
+            for w, ring in self.sma_rings.items():
+                ring.pop()
+                if undo["sma_evicted"][w] is not None:
+                    ring.appendleft(undo["sma_evicted"][w])
+
+    def _add_return(self, ret):
+        self.n += 1
+        delta = ret - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (ret - self.mean)
+        excess = ret - self.risk_free_rate / self.periods_per_year
+        self.downside_sq += min(excess, 0.0) ** 2
+
+    def _add_pair(self, ret, bench_ret):
+        self.pairs += 1
+        delta_b = bench_ret - self.pair_mean_b
+        self.pair_mean_r += (ret - self.pair_mean_r) / self.pairs
+        self.pair_mean_b += delta_b / self.pairs
+        self.co_moment += delta_b * (ret - self.pair_mean_r)
+        self.bench_m2 += delta_b * (bench_ret - self.pair_mean_b)
+
+    def _push_window(self, ret):
+        if len(self.ring) == self.window:
+            self._remove_from_window(self.ring[0])
+        self.ring.append(ret)
+        if ret is not None:
+            self.ring_n += 1
+            delta = ret - self.ring_mean
+            self.ring_mean += delta / self.ring_n
+            self.ring_m2 += delta * (ret - self.ring_mean)
+        # Recompute from the ring once per window (amortized O(1)) so removals cannot accumulate drift
+        self.ring_pushes += 1
+        if self.ring_pushes % self.window == 0:
+            values = [r for r in self.ring if r is not None]
+            self.ring_n = len(values)
+            self.ring_mean = sum(values) / len(values) if values else 0.0
+            self.ring_m2 = sum((r - self.ring_mean) ** 2 for r in values)
+
+    def _remove_from_window(self, ret):
+        if ret is None:
+            return
+        self.ring_n -= 1
+        if self.ring_n == 0:
+            self.ring_mean = self.ring_m2 = 0.0
+            return
+        delta = ret - self.ring_mean
+        self.ring_mean -= delta / self.ring_n
+        self.ring_m2 -= delta * (ret - self.ring_mean)
+
+    def _update_smas(self, close):
+        for w, ring in self.sma_rings.items():
+            if len(ring) == w:
+                self.sma_sums[w] -= ring[0]
+            ring.append(close)
+            self.sma_sums[w] += close
+
+    def metrics(self):
+        """Current scalar metrics, keyed like compute_metrics (rolling_volatility is the latest value)."""
+        ppy = self.periods_per_year
+        cumulative = self.last_close / self.first_close - 1 if self.first_close else math.nan
+        if self.n > 0:
+            annualized = (1 + cumulative) ** (ppy / self.n) - 1 if cumulative > -1 else math.nan
+        else:
+            annualized = 0.0
+        daily_vol = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else math.nan
+        mean_excess = self.mean - self.risk_free_rate / ppy if self.n else math.nan
+        downside = math.sqrt(self.downside_sq / self.n) if self.n else math.nan
+        rolling = math.nan
+        if len(self.ring) == self.window and self.ring_n == self.window and self.window > 1:
+            rolling = math.sqrt(max(self.ring_m2, 0.0) / (self.window - 1)) * math.sqrt(ppy)
+
+        result = {
+            "cumulative_return": cumulative,
+            "annualized_return": annualized,
+            "daily_volatility": daily_vol,
+            "annualized_volatility": daily_vol * math.sqrt(ppy),
+            "max_drawdown": self.max_drawdown,
+            "sharpe_ratio": mean_excess / daily_vol * math.sqrt(ppy) if daily_vol else math.nan,
+            "sortino_ratio": mean_excess / downside * math.sqrt(ppy) if downside else math.nan,
+            "beta": self.co_moment / self.bench_m2 if self.pairs >= 2 and self.bench_m2 else math.nan,
+            "observations": self.n,
+            "rolling_volatility": rolling,
+            "last_close": self.last_close,
+            "last_date": self.last_date,
+        }
+        for w, ring in self.sma_rings.items():
+            result[f"sma_{w}"] = self.sma_sums[w] / w if len(ring) == w else math.nan
+        return result
+
+    def to_dict(self):
+        """JSON-serializable state; StreamingMetrics.from_dict() resumes from it."""
+        state = {k: _json_safe(v) for k, v in vars(self).items() if k not in ("ring", "sma_rings", "sma_sums", "undo")}
+        state["undo"] = _json_safe(self.undo)
+        state["ring"] = _json_safe(self.ring)
+        state["sma_rings"] = {str(w): list(ring) for w, ring in self.sma_rings.items()}
+        state["sma_sums"] = {str(w): s for w, s in self.sma_sums.items()}
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        metrics = cls(state["window"], state["sma_windows"], state["risk_free_rate"], state["periods_per_year"])
+        for key, value in state.items():
+            if key in ("ring", "sma_rings", "sma_sums", "sma_windows", "last_date", "undo"):
+                continue
+            setattr(metrics, key, _from_json(value))
+        metrics.last_date = state["last_date"]
+        undo = state.get("undo")
+        if undo is not None:
+            undo["scalars"] = {
+                k: v if k == "last_date" else _from_json(v) for k, v in undo["scalars"].items()
+            }
+            undo["sma_sums"] = {int(w): s for w, s in undo["sma_sums"].items()}
+            undo["sma_evicted"] = {int(w): v for w, v in undo["sma_evicted"].items()}
+            metrics.undo = undo
+        metrics.ring = deque(state["ring"], maxlen=metrics.window)
+        metrics.sma_rings = {int(w): deque(ring, maxlen=int(w)) for w, ring in state["sma_rings"].items()}
+        metrics.sma_sums = {int(w): s for w, s in state["sma_sums"].items()}
+        return metrics
+
+
+def history_feed(tickers, period="1mo", benchmark=None, live=False):
+    """
+    Bar feed built from the market-data cache: yields (ticker, date, close,
+    benchmark_close) in date order, with NaN closes where a ticker has no bar
+    so every state advances on the same calendar as the batch engine. With
+    `live` the price store refetches the current session first.
+    """
+    symbols = list(tickers) + ([benchmark] if benchmark and benchmark not in tickers else [])
+    dates, columns, matrix = align_closes(
+        {ticker: market_data.fetch(ticker, "history", period, live=live)["Close"] for ticker in symbols}
+    )
+    bench = matrix[:, columns.index(benchmark)] if benchmark else None
+    positions = [(ticker, columns.index(ticker)) for ticker in tickers]
+    for row, date in enumerate(dates):
+        for ticker, column in positions:
+            yield ticker, date, matrix[row, column], None if bench is None else bench[row]
+
+
+class StreamingMetricsBook:
+    """
+    StreamingMetrics for a watchlist, persisted as one JSON file.
+
+    Feed it bars with stream()/consume(); bars before a ticker's last seen
+    date, or repeating it unchanged, are ignored, so an intraday refresh can
+    replay a recent window of history and only new or revised bars do any
+    work.
+    """
+
+    def __init__(self, path=DEFAULT_STREAMING_METRICS_PATH, **params):
+        self.path = path
+        self.params = params  # window, sma_windows, risk_free_rate, periods_per_year
+        self.states = {}
+        self._lock = threading.Lock()
+
+    def state(self, ticker):
+        ticker = ticker.upper()
+        if ticker not in self.states:
+            self.states[ticker] = StreamingMetrics(**self.params)
+        return self.states[ticker]
+
+    def update(self, ticker, date, close, benchmark_close=None):
+        with self._lock:
+            return self.state(ticker).update(close, date, benchmark_close)
+
+    def stream(self, feed):
+        """Apply each (ticker, date, close[, benchmark_close]) bar and yield (ticker, metrics) for new or revised ones."""
+        for bar in feed:
+            ticker, date, close = bar[:3]
+            if self.update(ticker, date, close, bar[3] if len(bar) > 3 else None):
+                yield ticker, self.metrics(ticker)
+
+    def consume(self, feed):
+        """Apply every bar in `feed`; returns the number of bars that were new or revised."""
+        return sum(1 for _ in self.stream(feed))
+
+    def refresh(self, tickers, period="5d", benchmark=None):
+        """
+        Pull the latest sessions for `tickers`, apply new and revised bars and
+        save. Bars are read in a fresh run cache with the current session
+        refetched, so repeated refreshes during the day pick up its updates.
+        """
+        with market_data.run_cache():
+            new_bars = self.consume(history_feed(tickers, period, benchmark, live=True))
+        self.save()
+        return new_bars
+
+    def metrics(self, ticker):
+        with self._lock:
+            return self.state(ticker).metrics()
+
+    def save(self):
+        """Write every state atomically to `path`."""
+        with self._lock:
+            payload = {"params": self.params, "states": {t: s.to_dict() for t, s in self.states.items()}}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_STREAMING_METRICS_PATH, **params):
+        """Book saved at `path`, or an empty one with `params` if there is none yet."""
+        if not os.path.exists(path):
+            return cls(path, **params)
+        with open(path) as f:
+            payload = json.load(f)
+        book = cls(path, **payload["params"])
+        book.states = {t: StreamingMetrics.from_dict(s) for t, s in payload["states"].items()}
+        return book
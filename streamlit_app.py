@@ -1,21 +1,64 @@
+import time
 import streamlit as st
-from main import agent_run  
+from main import agent_run
+from jobs import JobManager
+
+# Order in which specialist reports are shown, followed by the debate
+SECTION_TITLES = {
+    "Valuation Equity Analyst": "Valuation analysis",
+    "Sentiment Equity Analyst": "Sentiment analysis",
+    "Fundamental Financial Equity Analyst": "Fundamental analysis",
+    "Debate Moderator": "Debate and final recommendation",
+}
+
+
+@st.cache_resource
+def get_job_manager():
+    # One manager per server process, shared by every session so identical requests share a run
+    return JobManager(runner=agent_run)
+
+
 def main():
     st.title("Multi-Agent Stock Analysis and Recommendation")
 
     st.write("Enter the ticker symbol of the stock to analyze and choose your risk tolerance.")
 
     ticker = st.text_input("Ticker Symbol", value="TATAMOTORS")
-    risk_tolerance = st.selectbox("Risk Tolerance", options=["Risk-Neutral", "Risk-Averse"])
+    risk_tolerance = st.selectbox("Risk Tolerance", options=["Risk-Neutral", "Risk-Averse", "Risk-Seeking"])
 
     if st.button("Get Recommendation"):
-        # Integrate with your existing system logic here. Example placeholder:
-        recommendation = get_stock_recommendation(ticker, risk_tolerance)
-        st.write(f"**Recommendation for {ticker} ({risk_tolerance}): {recommendation}**")
+        # Submit and return immediately; the page polls the job below
+        st.session_state["job_id"] = get_job_manager().submit(ticker, risk_tolerance)
+
+    job_id = st.session_state.get("job_id")
+    if job_id:
+        show_job(job_id)
+
+
+def show_job(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        st.warning("This analysis is no longer available; please submit it again.")
+        return
+
+    st.caption(f"Job {job.id}: {job.ticker} ({job.risk_tolerance}), data as of {job.data_date} - {job.status}")
+    for role, title in SECTION_TITLES.items():
+        if role in job.sections and role != "Debate Moderator":
+            with st.expander(title, expanded=False):
+                st.markdown(job.sections[role])
+
+    if job.status == "done":
+        st.subheader(f"Recommendation for {job.ticker} ({job.risk_tolerance})")
+        st.markdown(job.result)
+    elif job.status == "error":
+        st.error(f"Analysis failed: {job.error}")
+    else:
+        done = sum(1 for role in SECTION_TITLES if role in job.sections)
+        st.progress(done / len(SECTION_TITLES), text="Analysis running...")
+        # Poll for new sections without blocking the server on the crew run
+        time.sleep(2)
+        st.rerun()
 
-def get_stock_recommendation(ticker, risk_tolerance):
-    result = agent_run(ticker,risk_tolerance)
-    return result
 
 if __name__ == "__main__":
     main()
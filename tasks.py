@@ -1,17 +1,35 @@
 # Define tasks for each agent with risk tolerance consideration
-from crewai import Agent,Task,Crew,Process
-from tools import get_stock_data_tool,get_financials_tool,calculate_metrics_tool,get_news_tool,analyze_sentiment_tool,scrape_tool
-from agents import valuation_agent,sentiment_agent,fundamental_agent,debate_manager
+# crewai, the tools and the shared agents are resolved when a task is created, not at import
+import agents
 
-def create_valuation_task(ticker, risk_tolerance="neutral"):
+RISK_PROFILES = ("averse", "neutral", "seeking")
+
+# Risk tolerance of specialist tasks whose evidence is shared by every profile in a fan-out run
+SHARED_EVIDENCE = "all"
+
+
+def _recommendation_scope(risk_tolerance):
+    # The closing lines are what consensus.extract_call reads for the debate fast path
+    if risk_tolerance == SHARED_EVIDENCE:
+        return ("for each risk tolerance, stating how the evidence bears on each, and end with one line per "
+                "profile in the form 'Recommendation (averse): BUY or SELL (confidence: N/10)', "
+                "then neutral and seeking")
+    return (f"and the {risk_tolerance} risk tolerance, and end with the line "
+            "'Recommendation: BUY or SELL (confidence: N/10)', N being your confidence out of 10")
+
+def create_valuation_task(ticker, risk_tolerance="neutral", agent=None):
     risk_prompt = ""
     if risk_tolerance == "averse":
         risk_prompt = "Focus on risk mitigation, volatility concerns, and capital preservation. "
     elif risk_tolerance == "seeking":
         risk_prompt = "Focus on growth potential and higher return opportunities. "
+    elif risk_tolerance == SHARED_EVIDENCE:
+        risk_prompt = "Report the metrics and trends in full; downside risk and upside potential both matter. "
     else:
         risk_prompt = "Balance risk and return considerations. "
 
+    from crewai import Task
+    import tools
     return Task(
         description=f"""
         Analyze the valuation trends of {ticker} stock using the FinancialDataTool.
@@ -23,22 +41,26 @@ def create_valuation_task(ticker, risk_tolerance="neutral"):
         - Price trends and patterns.
         Use the FinancialDataTool's `calculate_metrics` and `get_stock_data` methods to gather necessary data.
 
-        Provide a BUY or SELL recommendation with detailed justification based on the valuation analysis and the {risk_tolerance} risk tolerance.
+        Provide a BUY or SELL recommendation with detailed justification based on the valuation analysis {_recommendation_scope(risk_tolerance)}.
         """,
-        agent=valuation_agent,
-        tools=[calculate_metrics_tool, get_stock_data_tool],  # Use the new tool instances
+        agent=agent or agents.get_agent("valuation_agent"),
+        tools=[tools.get_tool("calculate_metrics_tool"), tools.get_tool("get_stock_data_tool")],  # Use the new tool instances
         expected_output="A detailed valuation analysis with metrics, trend analysis, and a clear BUY/SELL recommendation."
     )
 
-def create_sentiment_task(ticker, risk_tolerance="neutral"):
+def create_sentiment_task(ticker, risk_tolerance="neutral", agent=None):
     risk_prompt = ""
     if risk_tolerance == "averse":
         risk_prompt = "Be particularly cautious about negative news and sentiment. "
     elif risk_tolerance == "seeking":
         risk_prompt = "Focus on positive momentum and growth sentiment. "
+    elif risk_tolerance == SHARED_EVIDENCE:
+        risk_prompt = "Report both negative and positive sentiment with their sources. "
     else:
         risk_prompt = "Balance positive and negative sentiment factors. "
 
+    from crewai import Task
+    import tools
     return Task(
         description=f"""
         Analyze news sentiment and market perception for {ticker} using the NewsSentimentTool.
@@ -50,22 +72,26 @@ def create_sentiment_task(ticker, risk_tolerance="neutral"):
         - Market sentiment indicators.
         - Any significant corporate events or disclosures.
 
-        Provide a BUY or SELL recommendation based on sentiment analysis and the {risk_tolerance} risk tolerance.
+        Provide a BUY or SELL recommendation based on sentiment analysis {_recommendation_scope(risk_tolerance)}.
         """,
-        agent=sentiment_agent,
-        tools=[get_news_tool, analyze_sentiment_tool, scrape_tool],  # Use the new tool instances
+        agent=agent or agents.get_agent("sentiment_agent"),
+        tools=[tools.get_tool("get_news_tool"), tools.get_tool("analyze_sentiment_tool"), tools.get_tool("scrape_tool")],  # Use the new tool instances
         expected_output="A sentiment analysis summary with news highlights and a clear BUY/SELL recommendation."
     )
 
-def create_fundamental_task(ticker, risk_tolerance="neutral"):
+def create_fundamental_task(ticker, risk_tolerance="neutral", agent=None):
     risk_prompt = ""
     if risk_tolerance == "averse":
         risk_prompt = "Focus on financial stability, strong balance sheets, and consistent performance. "
     elif risk_tolerance == "seeking":
         risk_prompt = "Focus on growth potential, even if current financials are weaker. "
+    elif risk_tolerance == SHARED_EVIDENCE:
+        risk_prompt = "Cover both financial stability and growth potential. "
     else:
         risk_prompt = "Balance financial health with growth prospects. "
 
+    from crewai import Task
+    import tools
     return Task(
         description=f"""
         Conduct fundamental analysis of {ticker} based on available financial data using the FinancialDataTool.
@@ -78,21 +104,26 @@ def create_fundamental_task(ticker, risk_tolerance="neutral"):
         - Any areas of concern or competitive advantages.
         Use the FinancialDataTool's `get_financials` method to gather necessary data.
 
-        Provide a BUY or SELL recommendation based on fundamental analysis and the {risk_tolerance} risk tolerance.
+        Provide a BUY or SELL recommendation based on fundamental analysis {_recommendation_scope(risk_tolerance)}.
         """,
-        agent=fundamental_agent,
-        tools=[get_financials_tool, scrape_tool],  # Use the new tool instances
+        agent=agent or agents.get_agent("fundamental_agent"),
+        tools=[tools.get_tool("get_financials_tool"), tools.get_tool("scrape_tool")],  # Use the new tool instances
         expected_output="A comprehensive fundamental analysis with financial metrics and a clear BUY/SELL recommendation."
     )
 
-def create_debate_task(ticker, risk_tolerance="neutral"):
+def create_debate_task(ticker, risk_tolerance="neutral", context=None, agent=None, rounds=2):
+    # Specialist tasks that ran outside this crew are passed in as explicit context;
+    # otherwise the sequential crew hands the debate every earlier task output
+    extra = {"context": context} if context is not None else {}
+    times = {1: "once", 2: "twice"}.get(rounds, f"{rounds} times")
+    from crewai import Task
     return Task(
         description=f"""
         Bought Price of the stock is 957.60
         Coordinate a debate among the valuation, sentiment, and fundamental analysts
         about {ticker} stock with {risk_tolerance} risk tolerance.
 
-        Ensure each analyst presents their analysis and recommendation at least twice,
+        Ensure each analyst presents their analysis and recommendation at least {times},
         using the information generated from their respective tasks.
         Facilitate discussion until consensus is reached.
         Consolidate all perspectives into a final comprehensive stock analysis report.
@@ -106,6 +137,7 @@ def create_debate_task(ticker, risk_tolerance="neutral"):
 
         Reply "TERMINATE" when the debate is complete and consensus is reached.
         """,
-        agent=debate_manager,
-        expected_output="A comprehensive stock analysis report with consensus recommendation and detailed rationale."
+        agent=agent or agents.get_agent("debate_manager"),
+        expected_output="A comprehensive stock analysis report with consensus recommendation and detailed rationale.",
+        **extra
     )
\ No newline at end of file
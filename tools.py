@@ -1,40 +1,38 @@
 # Define tools as classes inheriting from BaseTool
-import yfinance as yf
-import pandas as pd
-import numpy as np
+# Heavy libraries (pandas, numpy, yfinance, Tavily) are imported inside _run
+import threading
 from crewai.tools import BaseTool
-from langchain_community.tools.tavily_search import TavilySearchResults
-from crewai_tools import ScrapeWebsiteTool, PDFSearchTool
+import market_data
+from tracing import traced_tool
 
 class GetStockHistoricalDataTool(BaseTool):
     name: str = "Get Stock Historical Data"
     description: str = "Fetches historical stock data for a given ticker and period (e.g., '3mo'). Input: ticker, period (optional, default '3mo')."
+    token_budget: int = 1500  # Max tokens of the payload handed to the LLM
 
+    @traced_tool
     def _run(self, ticker: str, period: str = "3mo"):
         """Use the tool."""
+        from payloads import encode_history
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period=period)
-            return hist.to_json() # Convert DataFrame to JSON string for easier handling by LLM
+            hist = market_data.fetch(ticker, "history", period)
+            return encode_history(hist, self.token_budget) # Summary stats plus a downsampled series as compact JSON
         except Exception as e:
             return f"Error fetching historical data for {ticker}: {e}"
 
 class GetCompanyFinancialsTool(BaseTool):
     name: str = "Get Company Financials"
-    description: str = "Fetches company financial statements (financials, balance sheet, cash flow) for a given ticker. Input: ticker."
+    description: str = "Fetches company fundamentals derived from the financial statements (margins, growth, free cash flow, leverage, liquidity, ROE) for a given ticker. Input: ticker."
+    token_budget: int = 1500  # Max tokens of the payload handed to the LLM
 
+    @traced_tool
     def _run(self, ticker: str):
         """Use the tool."""
+        from payloads import encode_ratios
+        from fundamentals import fundamentals_engine
         try:
-            stock = yf.Ticker(ticker)
-            financials = stock.financials.to_json()
-            balance_sheet = stock.balance_sheet.to_json()
-            cash_flow = stock.cashflow.to_json()
-            return {
-                'financials': financials,
-                'balance_sheet': balance_sheet,
-                'cash_flow': cash_flow
-            }
+            # Margins, growth, free cash flow, leverage, liquidity and ROE per fiscal period
+            return encode_ratios(fundamentals_engine.ratios(ticker), self.token_budget)
         except Exception as e:
             return f"Error fetching financial data for {ticker}: {e}"
 
@@ -42,32 +40,27 @@ class CalculateFinancialMetricsTool(BaseTool):
     name: str = "Calculate Financial Metrics"
     description: str = "Calculates financial metrics like returns and volatility for a given ticker and period (e.g., '3mo'). Input: ticker, period (optional, default '3mo')."
 
+    @traced_tool
     def _run(self, ticker: str, period: str = "3mo"):
         """Use the tool."""
+        from metrics_engine import compute_metrics
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period=period)
+            hist = market_data.fetch(ticker, "history", period)
 
             if len(hist) < 2:
                 return {"error": "Insufficient data"}
 
-            # Calculate returns and volatility
-            daily_returns = hist['Close'].pct_change().dropna()
-            cumulative_return = (hist['Close'].iloc[-1] / hist['Close'].iloc[0]) - 1
-            n = len(daily_returns)
-
-            # Annualized return (assuming 252 trading days)
-            annualized_return = (1 + cumulative_return) ** (252/n) - 1 if n > 0 else 0
-
-            # Annualized volatility
-            daily_volatility = daily_returns.std()
-            annualized_volatility = daily_volatility * np.sqrt(252)
+            # Single-column pass through the vectorized metrics engine
+            metrics = compute_metrics(hist['Close'].to_numpy())
 
             return {
-                'cumulative_return': cumulative_return,
-                'annualized_return': annualized_return,
-                'daily_volatility': daily_volatility,
-                'annualized_volatility': annualized_volatility,
+                'cumulative_return': float(metrics['cumulative_return'][0]),
+                'annualized_return': float(metrics['annualized_return'][0]),
+                'daily_volatility': float(metrics['daily_volatility'][0]),
+                'annualized_volatility': float(metrics['annualized_volatility'][0]),
+                'max_drawdown': float(metrics['max_drawdown'][0]),
+                'sharpe_ratio': float(metrics['sharpe_ratio'][0]),
+                'sortino_ratio': float(metrics['sortino_ratio'][0]),
                 'price_data_sample': hist.head().to_json() # Return a sample as JSON
             }
         except Exception as e:
@@ -77,95 +70,41 @@ class NewsSearchTool(BaseTool):
     name: str = "News Search Tool"
     description: str = "Searches for recent news using Tavily Search API"
 
-    
-
-    def _run(self, ticker: str, max_results: int = 10) -> dict:
+    @traced_tool
+    def _run(self, ticker: str, max_results: int = 5) -> dict:
         """Search for recent news about a company using Tavily Search"""
+        from news import news_store
         try:
-            # Get company name first for better search results
-            stock_info = yf.Ticker(ticker).info
-            company_name = stock_info.get('longName', ticker)
-
-            # Search for news about the company using Tavily
-            search_query = f"{company_name} {ticker} stock news financial earnings"
-
-            # Use Tavily's search with news focus
-            tavily_tool = TavilySearchResults(max_results=5)
-            results = tavily_tool.invoke(search_query)
-            return results
-
-
-            # Format results to match expected structure
-            formatted_results = []
-            for result in results.get('results', []):
-                formatted_results.append({
-                    'title': result.get('title', 'No title'),
-                    'body': result.get('content', result.get('raw_content', 'No content')),
-                    'date': self._extract_date(result),
-                    'source': self._extract_source(result.get('url', '')),
-                    'url': result.get('url', '')
-                })
-
-            return {"news": formatted_results}
+            # Served from the news store when this query already ran today (or from a recorded snapshot in replay mode)
+            return {"news": news_store.news_for_ticker(ticker, max_results)}
 
         except Exception as e:
             print(f"Tavily search error: {e}")
             return {"error": f"Error searching news for {ticker}: {str(e)}", "news": []}
 
-    def _extract_source(self, url: str) -> str:
-        """Extract domain name from URL"""
-        if not url:
-            return "Unknown"
-        try:
-            from urllib.parse import urlparse
-            domain = urlparse(url).netloc
-            if domain.startswith('www.'):
-                domain = domain[4:]
-            return domain
-        except:
-            return "Unknown"
-
-    def _extract_date(self, result: dict) -> str:
-        """Extract or infer date from result"""
-        # Tavily doesn't always provide exact dates, so we can use current date as fallback
-        return result.get('published_date', datetime.now().strftime('%Y-%m-%d'))
-
 class SentimentAnalysisTool(BaseTool):
     name: str = "Sentiment Analysis Tool"
     description: str = "Analyzes sentiment from news articles"
 
+    @traced_tool
     def _run(self, news_items: list) -> dict:
         """Enhanced sentiment analysis with Tavily results"""
         if not news_items:
             return {"sentiment_score": 0, "news_summaries": [], "detailed_news": []}
 
-        positive_keywords = ['buy', 'strong', 'growth', 'positive', 'outperform',
-                           'upgrade', 'bullish', 'profit', 'gain', 'beat', 'raise',
-                           'strong buy', 'overweight', 'outperform', 'earnings beat',
-                           'revenue growth', 'profitability', 'innovation']
-        negative_keywords = ['sell', 'weak', 'decline', 'negative', 'underperform',
-                           'downgrade', 'bearish', 'loss', 'drop', 'miss', 'cut',
-                           'reduce', 'underweight', 'earnings miss', 'layoff',
-                           'lawsuit', 'investigation', 'declining']
-
-        sentiment_scores = []
+        # One compiled-lexicon pass over every article
+        from sentiment import score_articles
+        scores = score_articles(news_items)
+        sentiment_scores = scores["score"].tolist()
         news_summaries = []
         detailed_news = []
 
-        for item in news_items:
+        for i, item in enumerate(news_items):
             title = item.get('title', '').lower()
-            body = item.get('body', '').lower()
             date = item.get('date', '')
             source = item.get('source', '')
             url = item.get('url', '')
-
-            text = title + " " + body
-
-            positive_count = sum(1 for word in positive_keywords if word in text)
-            negative_count = sum(1 for word in negative_keywords if word in text)
-
-            score = positive_count - negative_count
-            sentiment_scores.append(score)
+            score = sentiment_scores[i]
 
             # Store detailed news info
             detailed_news.append({
@@ -174,14 +113,15 @@ class SentimentAnalysisTool(BaseTool):
                 'source': source,
                 'url': url,
                 'sentiment_score': score,
-                'positive_keywords': positive_count,
-                'negative_keywords': negative_count
+                'positive_keywords': int(scores["positive_hits"][i]),
+                'negative_keywords': int(scores["negative_hits"][i]),
+                'negated_keywords': int(scores["negated_hits"][i])
             })
 
             # Create summary of key news
             sentiment = "positive" if score > 0 else "negative" if score < 0 else "neutral"
             if abs(score) >= 1:  # Only include notable news
-                news_summaries.append(f"{title[:100]}... ({sentiment}, score: {score}, {source})")
+                news_summaries.append(f"{title[:100]}... ({sentiment}, score: {score:g}, {source})")
 
         avg_sentiment = sum(sentiment_scores) / len(sentiment_scores) if sentiment_scores else 0
 
@@ -194,10 +134,49 @@ class SentimentAnalysisTool(BaseTool):
             "negative_articles": sum(1 for score in sentiment_scores if score < 0),
             "neutral_articles": sum(1 for score in sentiment_scores if score == 0)
         }
-# Initialize instances of the new BaseTool-derived classes
-get_stock_data_tool = GetStockHistoricalDataTool()
-get_financials_tool = GetCompanyFinancialsTool()
-calculate_metrics_tool = CalculateFinancialMetricsTool()
-get_news_tool = NewsSearchTool()
-analyze_sentiment_tool = SentimentAnalysisTool()
-scrape_tool = ScrapeWebsiteTool()
+
+
+class ScrapeWebsiteTool(BaseTool):
+    name: str = "Read website content"
+    description: str = "Reads the main text of one or more web pages (e.g. investor-relations pages). Input: website_url, or urls (a list) to read several pages at once."
+    token_budget: int = 1500  # Max tokens of page text handed to the LLM, shared by all pages of a call
+
+    @traced_tool
+    def _run(self, website_url: str = "", urls: list = None):
+        """Fetch the pages concurrently through the shared connection pool and page cache."""
+        from scraping import scraper
+        try:
+            pages = scraper.scrape(([website_url] if website_url else []) + list(urls or []), self.token_budget)
+            if not pages:
+                return "Error: no URL given"
+            return {"pages": pages}
+        except Exception as e:
+            return f"Error reading {website_url or urls}: {e}"
+
+
+# Tool instances are built on first use through get_tool() or attribute access
+# (`from tools import scrape_tool` still works)
+TOOL_FACTORIES = {
+    "get_stock_data_tool": GetStockHistoricalDataTool,
+    "get_financials_tool": GetCompanyFinancialsTool,
+    "calculate_metrics_tool": CalculateFinancialMetricsTool,
+    "get_news_tool": NewsSearchTool,
+    "analyze_sentiment_tool": SentimentAnalysisTool,
+    "scrape_tool": ScrapeWebsiteTool,
+}
+_tools = {}
+_tools_lock = threading.Lock()
+
+
+def get_tool(name):
+    """Shared instance of the tool registered as `name`, created on first use."""
+    with _tools_lock:
+        if name not in _tools:
+            _tools[name] = TOOL_FACTORIES[name]()
+        return _tools[name]
+
+
+def __getattr__(name):
+    if name in TOOL_FACTORIES:
+        return get_tool(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
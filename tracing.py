@@ -0,0 +1,185 @@
+# Per-run tracing of tasks, agent turns, tool calls and LLM calls, with JSON and Prometheus exporters
+import json
+import time
+import uuid
+import hashlib
+import functools
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Numeric span attributes summed in summaries and exported as counters
+COUNTED_ATTRIBUTES = ("payload_bytes", "prompt_tokens", "completion_tokens", "retries", "fast_path", "budget_cutoff")
+
+
+def args_hash(*args, **kwargs):
+    """Short stable hash of call arguments, so spans can be grouped without storing inputs."""
+    encoded = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:12]
+
+
+class Tracer:
+    """Collects the spans of one run."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, start, end, **attributes):
+        """Add a finished span given its wall-clock start and end (time.time())."""
+        span = {
+            "kind": kind,
+            "name": name,
+            "start": start,
+            "duration_s": end - start,
+            "thread": threading.current_thread().name,
+            **attributes,
+        }
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, kind, name, **attributes):
+        """
+        Time the enclosed block as one span.
+
+        Yields the attribute dict, so the block can add fields such as
+        payload_bytes or token counts before the span is recorded.
+        """
+        start = time.time()
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.record(kind, name, start, time.time(), **attributes)
+
+    def summary(self):
+        """Aggregate spans by (kind, name): count, errors, total/mean/max seconds and counted attributes."""
+        groups = defaultdict(list)
+        with self._lock:
+            for span in self.spans:
+                groups[(span["kind"], span["name"])].append(span)
+        rows = []
+        for (kind, name), spans in groups.items():
+            durations = [s["duration_s"] for s in spans]
+            row = {
+                "kind": kind,
+                "name": name,
+                "count": len(spans),
+                "errors": sum(1 for s in spans if s.get("error")),
+                "total_s": sum(durations),
+                "mean_s": sum(durations) / len(durations),
+                "max_s": max(durations),
+            }
+            for attribute in COUNTED_ATTRIBUTES:
+                row[attribute] = sum(s.get(attribute, 0) or 0 for s in spans)
+            rows.append(row)
+        return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+    def summary_table(self):
+        """Summary as a fixed-width text table, slowest first."""
+        header = f"{'kind':<11} {'name':<38} {'count':>5} {'err':>4} {'total s':>9} {'mean s':>8} {'max s':>8} {'bytes':>9} {'tok in':>8} {'tok out':>8}"
+        lines = [header, "-" * len(header)]
+        for r in self.summary():
+            lines.append(
+                f"{r['kind']:<11} {r['name'][:38]:<38} {r['count']:>5} {r['errors']:>4} "
+                f"{r['total_s']:>9.2f} {r['mean_s']:>8.2f} {r['max_s']:>8.2f} "
+                f"{r['payload_bytes']:>9} {r['prompt_tokens']:>8} {r['completion_tokens']:>8}"
+            )
+        return "\n".join(lines)
+
+    def export_json(self, path):
+        """Write every span of the run to a JSON trace file."""
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w") as f:
+            json.dump({"run_id": self.run_id, "spans": spans}, f, indent=2, default=str)
+
+    def export_prometheus(self, path=None):
+        """Render the summary in Prometheus text exposition format; also written to `path` if given."""
+        def label(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+        metrics = [
+            ("equity_span_count_total", "Spans recorded", "count"),
+            ("equity_span_errors_total", "Spans that ended in an error", "errors"),
+            ("equity_span_seconds_total", "Wall time spent in spans", "total_s"),
+            ("equity_span_payload_bytes_total", "Bytes returned by spans", "payload_bytes"),
+            ("equity_span_prompt_tokens_total", "Prompt tokens sent", "prompt_tokens"),
+            ("equity_span_completion_tokens_total", "Completion tokens received", "completion_tokens"),
+            ("equity_span_retries_total", "Retries inside spans", "retries"),
+            ("equity_span_fast_path_total", "Debates replaced by a single consolidation call", "fast_path"),
+            ("equity_span_budget_cutoff_total", "Debates stopped by their budget", "budget_cutoff"),
+        ]
+        summary = self.summary()
+        lines = []
+        for metric, help_text, field in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for r in summary:
+                lines.append(
+                    f'{metric}{{run_id="{label(self.run_id)}",kind="{label(r["kind"])}",name="{label(r["name"])}"}} {r[field]}'
+                )
+        text = "\n".join(lines) + "\n"
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+
+# Tracer of the current run, and every open run (for threads that did not inherit the run's context)
+_active_tracer = ContextVar("tracer", default=None)
+_open_tracers = []
+
+
+def current_tracer():
+    """Tracer of the current run, the latest open run, or None when nothing is being traced."""
+    tracer = _active_tracer.get()
+    if tracer is not None:
+        return tracer
+    return _open_tracers[-1] if _open_tracers else None
+
+
+@contextmanager
+def trace_run(run_id=None):
+    """Trace everything that happens inside the block into a new Tracer."""
+    tracer = Tracer(run_id)
+    token = _active_tracer.set(tracer)
+    _open_tracers.append(tracer)
+    try:
+        yield tracer
+    finally:
+        _open_tracers.remove(tracer)
+        _active_tracer.reset(token)
+
+
+@contextmanager
+def span(kind, name, **attributes):
+    """Span on the current tracer; a plain attribute dict when nothing is being traced."""
+    tracer = current_tracer()
+    if tracer is None:
+        yield attributes
+        return
+    with tracer.span(kind, name, **attributes) as attrs:
+        yield attrs
+
+
+def traced_tool(run):
+    """Decorator for BaseTool._run: one "tool" span per call with argument hash and payload size."""
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        with span("tool", self.name, args_hash=args_hash(*args, **kwargs)) as attrs:
+            result = run(self, *args, **kwargs)
+            attrs["payload_bytes"] = len(str(result).encode("utf-8"))
+            # Tools report failures as return values rather than raising
+            if isinstance(result, str) and result.startswith("Error"):
+                attrs["error"] = result[:200]
+            elif isinstance(result, dict) and result.get("error"):
+                attrs["error"] = str(result["error"])[:200]
+            return result
+    return wrapper